@@ -14,8 +14,14 @@ class Deck():
         # ('scary_mary', None)
     ]
 
+    # Duplicated cards (escape, pirate, mermaid) share the index of their
+    # last copy in card2index, card2indexes lists the index of every copy.
     card2index = {card: i for i, card in enumerate(cards_list)}
-    index2card: {i: card for i, card in enumerate(cards_list)}
+    index2card = {i: card for i, card in enumerate(cards_list)}
+    card2indexes = {}
+    for i, card in enumerate(cards_list):
+        card2indexes.setdefault(card, []).append(i)
+    del i, card
 
     number_of_cards = len(cards_list)
     cards_to_draw = None
@@ -0,0 +1,56 @@
+import numpy as np
+
+from Deck import Deck
+
+
+class DeckService():
+    '''
+    Shuffled decks drawn in bulk from a NumPy generator of its own: a batch
+    of shuffles is one permutation matrix (one row of card indexes of
+    Deck.cards_list per shuffle) and hands are dealt as slices of a row.
+    The generator does not share the state of the 'random' module, so the
+    deals of a game only depend on the seed of the service, not on what
+    the players computed. Independent services (one per game, one per
+    worker...) are made with spawn.
+    The service only speeds up shuffling: init_round turns the dealt
+    indexes into cards, which the rest of the engine plays with.
+    '''
+
+    def __init__(self, seed=None, batch_size=16):
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self.seed_sequence = seed
+        self.rng = np.random.default_rng(seed)
+        self.batch_size = batch_size
+        self.permutations = None
+        self.i_permutation = batch_size
+
+    def spawn(self, nb_services: int):
+        '''
+        Services with independent streams derived from the seed of this one.
+        '''
+        return [
+            DeckService(seed, self.batch_size)
+            for seed in self.seed_sequence.spawn(nb_services)]
+
+    def get_permutation(self):
+        '''
+        Next shuffle: the card indexes of the deck in random order.
+        '''
+        if self.i_permutation == self.batch_size:
+            self.permutations = self.rng.permuted(
+                np.tile(
+                    np.arange(Deck.number_of_cards, dtype=np.int8),
+                    (self.batch_size, 1)),
+                axis=1)
+            self.i_permutation = 0
+        self.i_permutation += 1
+        return self.permutations[self.i_permutation - 1]
+
+    def deal(self, nb_players: int, nb_cards: int):
+        '''
+        Card indexes of the hands of a new shuffle, as an array of shape
+        (nb_players, nb_cards).
+        '''
+        return self.get_permutation()[:nb_players * nb_cards].reshape(
+            nb_players, nb_cards)
@@ -0,0 +1,102 @@
+import json
+import sqlite3
+
+from GameConfig import OUTCOME_ATTRIBUTES
+
+
+class ExperimentStore():
+    '''
+    SQLite file with the configs of a sweep (see sweep.py) and the result
+    of each game played with them:
+        - configs: id_config, config (JSON of the attributes of the config
+          that change the games, see GameConfig.OUTCOME_ATTRIBUTES)
+        - games: id_config, i_game (position of the game in the seeds of
+          the config), seed, players_scores (JSON), winner
+    Games are added by batches, each batch in one transaction, so an
+    interrupted sweep keeps all the batches written before.
+    '''
+
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript('''
+            CREATE TABLE IF NOT EXISTS configs (
+                id_config INTEGER PRIMARY KEY,
+                config TEXT NOT NULL UNIQUE);
+            CREATE TABLE IF NOT EXISTS games (
+                id_config INTEGER NOT NULL REFERENCES configs(id_config),
+                i_game INTEGER NOT NULL,
+                seed INTEGER NOT NULL,
+                players_scores TEXT NOT NULL,
+                winner INTEGER NOT NULL,
+                PRIMARY KEY (id_config, i_game));
+        ''')
+
+    def close(self):
+        self.connection.close()
+
+    @staticmethod
+    def dumps_config(config_dict: dict):
+        return json.dumps(config_dict, sort_keys=True)
+
+    @staticmethod
+    def loads_config(config_json: str):
+        '''
+        JSON object keys are strings: the keys of the player_id2* dicts are
+        turned back into ints.
+        '''
+        config_dict = json.loads(config_json)
+        for k, v in config_dict.items():
+            if isinstance(v, dict):
+                config_dict[k] = {
+                    int(x) if x.lstrip('-').isdigit() else x: y
+                    for x, y in v.items()}
+        return config_dict
+
+    def get_id_config(self, config_dict: dict):
+        '''
+        Id of the OUTCOME_ATTRIBUTES of 'config_dict', added if new.
+        '''
+        config_json = self.dumps_config(
+            {k: v for k, v in config_dict.items() if k in OUTCOME_ATTRIBUTES})
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR IGNORE INTO configs (config) VALUES (?)',
+                (config_json,))
+        return self.connection.execute(
+            'SELECT id_config FROM configs WHERE config = ?',
+            (config_json,)).fetchone()[0]
+
+    def get_configs(self):
+        '''
+        [(id_config, config_dict), ...] in order of addition.
+        '''
+        return [
+            (id_config, self.loads_config(config_json))
+            for id_config, config_json in self.connection.execute(
+                'SELECT id_config, config FROM configs ORDER BY id_config')]
+
+    def get_finished_games(self, id_config: int):
+        return {
+            i_game for i_game, in self.connection.execute(
+                'SELECT i_game FROM games WHERE id_config = ?',
+                (id_config,))}
+
+    def add_games(self, id_config: int, games: list):
+        '''
+        Add the games [(i_game, seed, players_scores, winner), ...] in
+        one transaction.
+        '''
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO games VALUES (?, ?, ?, ?, ?)',
+                [(id_config, i_game, seed, json.dumps(players_scores),
+                  winner)
+                 for i_game, seed, players_scores, winner in games])
+
+    def get_victory_counts(self, id_config: int, nb_players: int):
+        players_victory_count = {k: 0 for k in range(nb_players)}
+        for winner, count in self.connection.execute(
+                'SELECT winner, COUNT(*) FROM games WHERE id_config = ? '
+                'GROUP BY winner', (id_config,)):
+            players_victory_count[winner] = count
+        return players_victory_count
@@ -1,6 +1,8 @@
 import random
 from typing import List
 from Node import Node
+from GameState import GameState
+import instrumentation
 
 
 class Game():
@@ -30,9 +32,19 @@ class Game():
     # example: [[0, 0, 1, 0], [0, 0, 0, 0]]]
     # -> 2 players, round 4, p1 played 3rd card
     players_played_cards_indexes = []
+    # Index in Deck.cards_list of each card of the hand of each player
+    # (each copy of a duplicated card has its own index), bitmasks of these
+    # indexes for the hand and the played cards (see bitmask_utils), kept
+    # in line with players_cards and players_played_cards_indexes.
+    players_card_indexes = []
+    players_hand_masks = []
+    players_played_masks = []
     # Keep track of observed cards (in hand and played) by each player
     # Possibility to only update mcts players (useless for others)
     players_observed_cards_in_round = []
+    # Colors each player is known to have no more card of in the round
+    # (he did not follow them), example: [(), ('red',)]
+    players_void_colors = []
     # Predictions of folds each player make for the round
     players_pred_folds: List[str] = []
     # Won folds of each player at the end of the round
@@ -41,6 +53,9 @@ class Game():
     player_id2nb_of_iterations = {}
     player_id2type_player = {}
     player_id2is_cheater = {}
+    player_id2allocation = {}
+    player_id2time_budget_ms = {}
+    player_id2mcts_type = {}
 
     # The chosen color during a fold
     chosen_color = None
@@ -64,10 +79,32 @@ class Game():
     chckpt_player_turn = 0
     nb_iters_per_action = 20
 
+    # Information about the last search of an mcts player
+    # (set by flatmc, see game_logic)
+    search_info = {}
+    # During playouts, if set, function(game, player_id, legal_moves, phase)
+    # choosing the moves instead of random choices (see parallel_ismcts)
+    playout_policy = None
+    # Hashes of the information states of the round (see zobrist)
+    public_info_hash = 0
+    players_hand_hashes = []
+    # Statistics of puremcts shared by transpositions (see
+    # TranspositionTable) and hashes of the states reached in this game
+    transposition_table = None
+    transposition_path = []
+    # Deals the cards if set, else a Deck is shuffled at each round
+    deck_service = None
+    # If set, function(game, player_id, phase, move) called by play_round
+    # at each decision of the game (not of playouts), before the move is
+    # played (see self_play)
+    decision_recorder = None
+
     node_root: Node
     node_current: Node
 
-    def __init__(self, node_root=None, **args):
+    def __init__(
+            self, node_root=None, transposition_table=None,
+            deck_service=None, decision_recorder=None, **args):
 
         self.nb_players = args['nb_players']
         assert args['first_game_round'] <= args['last_game_round']
@@ -79,6 +116,40 @@ class Game():
         self.player_id2type_player = args['player_id2type_player']
         self.player_id2nb_of_iterations = args['player_id2nb_of_iterations']
         self.player_id2is_cheater = args['player_id2is_cheater']
+        self.player_id2allocation = args['player_id2allocation']
+        self.player_id2time_budget_ms = args['player_id2time_budget_ms']
+        self.player_id2mcts_type = args['player_id2mcts_type']
 
         self.node_root = node_root
         self.node_current = self.node_root
+        self.transposition_table = transposition_table
+        self.transposition_path = []
+        self.deck_service = deck_service
+        self.decision_recorder = decision_recorder
+
+    def get_players_config(self):
+        '''
+        player_id2* attributes: with the bytes of a GameState (see
+        GameState.to_bytes), what another process needs to rebuild the
+        game (see game_logic.get_game_from_bytes).
+        '''
+        return {
+            'player_id2type_player': self.player_id2type_player,
+            'player_id2nb_of_iterations': self.player_id2nb_of_iterations,
+            'player_id2is_cheater': self.player_id2is_cheater,
+            'player_id2allocation': self.player_id2allocation,
+            'player_id2time_budget_ms': self.player_id2time_budget_ms,
+            'player_id2mcts_type': self.player_id2mcts_type}
+
+    def snapshot(self) -> GameState:
+        '''
+        Save the state of the current round (see GameState).
+        '''
+        if instrumentation.enabled:
+            instrumentation.incr('snapshots')
+        return GameState(self)
+
+    def restore(self, state: GameState):
+        if instrumentation.enabled:
+            instrumentation.incr('restores')
+        state.restore(self)
@@ -3,7 +3,20 @@ class GameConfig():
     id_config = 0
     csv_name = './games.csv'
     nb_games = 1
+    # Seed of the random generators (None: not seeded)
+    seed = None
+    # Number of processes main.main spreads the games over
+    # (1: games are played one after the other)
+    nb_game_workers = 1
+    # Deal the cards of each game from a DeckService seeded by the seed of
+    # the game: the deals no longer depend on the moves of the players, so
+    # two runs with the same seed play the same deals whatever the players
+    deck_streams = False
     log_level = 'DEBUG'  # DEBUG, INFO, WARNING, ERROR
+    # Count playouts, snapshots, determinizations, fold resolutions and
+    # time the decisions of each game (see instrumentation), written to
+    # the CSV of csv_name with a '_stats' suffix
+    instrumentation = False
 
     # NUMBER OF ROUNDS
     # An usual game has 10 rounds (below parameters might not be changed)
@@ -27,6 +40,14 @@ class GameConfig():
         2: 15
     }
 
+    # Time budget of each decision in milliseconds (None: no time limit).
+    # The search stops at the first of the time budget and the number of
+    # iterations (which can be set to None to only use the time budget).
+    player_id2time_budget_ms = {
+        1: None,
+        2: None
+    }
+
     # if value is True, mcts has all informations on the game
     # (ie mcts sees players' hands) else,
     # mcts plays with hidden information (PIMC) and generates
@@ -37,7 +58,100 @@ class GameConfig():
         2: False
     }
 
+    # How flatmc shares the iterations of a card decision between the legal
+    # moves: 'uniform' (same number for each move), 'ucb1' or
+    # 'successive_halving' (more playouts for the most promising moves).
+    # (Not need to attribute values to 'random' players)
+    player_id2allocation = {
+        1: 'uniform',
+        2: 'uniform'
+    }
+
     # MCTS
     mcts_type = 'flatmc'  # available choices:
     # - flatmc
     # - puremcts - WARNING NOT FINISHED ! NOT REALLY USEABLE YET
+    # - parallel_ismcts (information set MCTS with one tree searched by
+    # nb_decision_workers processes, see parallel_ismcts.py)
+    # Directory where the puremcts tree is saved at the end of main.main
+    # and loaded from at the beginning (None: the tree is not saved)
+    tree_path = None
+    # Maximum number of nodes of the puremcts tree (None: no limit). When
+    # it is exceeded after a game, the least visited subtrees are removed
+    # until the tree is back to 'tree_eviction_ratio' of this size.
+    tree_max_nodes = None
+    tree_eviction_ratio = 0.9
+    # Number of information states whose statistics puremcts shares
+    # between transpositions and games (None: no transposition table)
+    transposition_table_size = None
+    # mcts_type of some players if different from 'mcts_type'
+    player_id2mcts_type = {}
+    # UCT exploration constant of parallel_ismcts (rewards are in [0, 1])
+    ismcts_exploration = 0.7
+    # Shared tree of parallel_ismcts: maximum number of nodes (no more
+    # expansions once full), visits without reward added to each node a
+    # worker selects until its iteration ends, number of locks the
+    # updates of the nodes are spread over.
+    parallel_ismcts_capacity = 200000
+    parallel_ismcts_virtual_loss = 1
+    parallel_ismcts_nb_lock_stripes = 64
+
+    # flatmc and parallel_ismcts choose the cards with the exact endgame
+    # solver once at most 'endgame_max_cards_left' cards are left to play
+    # in the round (all players together, None: never).
+    # Non-cheaters average the solutions of 'endgame_nb_determinizations'
+    # determinizations.
+    # Cost per card decision of 2 players against flatmc with 15
+    # iterations (python backend): 0.1 ms against 0.6 ms with 4 cards
+    # left, 0.4 against 0.9 with 6 and 2.5 against 1.0 with 8 for a
+    # cheater; for a non-cheater 1.9 ms against 0.8 with 4 cards left, 8
+    # against 1.4 with 6 and 50 against 1.5 with 8.
+    endgame_max_cards_left = None
+    endgame_nb_determinizations = 20
+
+    # Folds won in random rounds by round, seat and coarse features of
+    # the hand (see ValueTable, built by 'python build_value_table.py
+    # PATH'), None: no table. With a table:
+    # - value_table_playout_bids: players of the playouts bid the bid of
+    # best expected score in the table instead of a random bid
+    # - value_table_flatmc_bids: flatmc scores its bids with the folds
+    # distribution of the table instead of playing the playouts (cards
+    # are random in playouts, so the folds do not depend on the bids)
+    value_table_path = None
+    value_table_playout_bids = False
+    value_table_flatmc_bids = False
+
+    # Where flatmc runs its playouts:
+    # - python: one by one with play_round
+    # - numpy: all the playouts of a move at once (batch_playouts), allows
+    # thousands of iterations per move
+    flatmc_backend = 'python'
+
+    # Number of processes flatmc splits the playouts of a decision over
+    # (1: no process pool)
+    nb_decision_workers = 1
+
+    # If True, flatmc plays every legal card against the same
+    # determinizations and random draws at each iteration (common random
+    # numbers), so that moves are compared on the same worlds.
+    flatmc_common_random_numbers = False
+
+
+# Attributes of GameConfig that change the games played with a config; the
+# other ones only change how the games are run (number of games, workers,
+# logs, output files...). A config of an ExperimentStore is identified by
+# these attributes only, so a sweep resumes with more games or workers. A
+# new attribute changing the games must be added here to be swept (the
+# configs already stored then get new ids).
+OUTCOME_ATTRIBUTES = (
+    'seed', 'deck_streams', 'first_game_round', 'last_game_round',
+    'nb_players', 'player_id2type_player', 'player_id2nb_of_iterations',
+    'player_id2time_budget_ms', 'player_id2is_cheater',
+    'player_id2allocation', 'mcts_type', 'tree_max_nodes',
+    'tree_eviction_ratio', 'transposition_table_size',
+    'player_id2mcts_type', 'ismcts_exploration',
+    'parallel_ismcts_capacity', 'parallel_ismcts_virtual_loss',
+    'endgame_max_cards_left', 'endgame_nb_determinizations',
+    'value_table_path', 'value_table_playout_bids',
+    'value_table_flatmc_bids', 'flatmc_backend',
+    'flatmc_common_random_numbers')
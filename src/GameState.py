@@ -0,0 +1,282 @@
+import struct
+
+from Deck import Deck
+
+# Binary encoding of a GameState (see GameState.to_bytes), version 1:
+# a header, then one fixed-size block per player. Cards are their
+# Deck.card2index index (NO_CARD: empty slot), colors their index in
+# COLORS plus one (0: None), bit i of a mask is the item i of a list.
+STATE_MAGIC = b'SKGS'
+STATE_VERSION = 1
+# magic, version, nb_players, game_round, first_round_player,
+# first_player, chosen_color, mode_playout, chckpt_bid, chckpt_fold,
+# chckpt_player_turn, public_info_hash
+STATE_HEADER = struct.Struct('<4s10BQ')
+# hand (game_round cards), played mask, observed mask, void colors (in
+# the order they were seen), bid, won folds, score, hand hash, card
+# played at this position of the fold in progress
+STATE_PLAYER = struct.Struct('<10sH9s4sbBiQB')
+MAX_HAND_SIZE = 10
+NO_CARD = 255
+# 255 also stands for a first_player not set yet
+NO_PLAYER = 255
+COLORS = ('red', 'blue', 'yellow', 'black', 'incolor')
+# Values of the 8 items of a byte of a played or observed mask (observed
+# cards take the values set by init_round and
+# set_card_as_observed_by_player)
+BYTE2DIGIT = bytes.maketrans(b'\x00\x01', b'01')
+BYTE2PLAYED = [[bool(x >> i & 1) for i in range(8)] for x in range(256)]
+BYTE2OBSERVED = [
+    [True if x >> i & 1 else 0 for i in range(8)] for x in range(256)]
+
+
+class GameState():
+    '''
+    Compact copy of the part of a Game that changes during a round.
+    Nested per-player lists of the Game are stored as flat lists with a
+    fixed stride (game_round for hands, Deck.number_of_cards for observed
+    cards), so taking or restoring a snapshot is a few slice copies
+    instead of the recursive walk done by deepcopy(game).
+    Used by the mcts algorithms to rewind the game between playouts:
+        state = game.snapshot()
+        ... play_round(game) ...
+        game.restore(state)
+    '''
+    __slots__ = (
+        'nb_players', 'game_round', 'first_round_player', 'first_player',
+        'chosen_color', 'mode_playout',
+        'chckpt_bid', 'chckpt_fold', 'chckpt_player_turn',
+        'public_info_hash', 'players_hand_hashes',
+        'players_cards', 'players_played_cards_indexes',
+        'players_card_indexes', 'players_hand_masks', 'players_played_masks',
+        'players_observed_cards_in_round', 'players_void_colors',
+        'players_pred_folds', 'players_won_folds', 'players_scores',
+        'fold_cards')
+
+    def __init__(self, game):
+        self.nb_players = game.nb_players
+        self.game_round = game.game_round
+        self.first_round_player = game.first_round_player
+        self.first_player = game.first_player
+        self.chosen_color = game.chosen_color
+        self.mode_playout = game.mode_playout
+        self.chckpt_bid = game.chckpt_bid
+        self.chckpt_fold = game.chckpt_fold
+        self.chckpt_player_turn = game.chckpt_player_turn
+        self.public_info_hash = game.public_info_hash
+        self.players_hand_hashes = tuple(game.players_hand_hashes)
+        # Flat buffers, one block of 'stride' values per player
+        self.players_cards = [
+            card for hand in game.players_cards for card in hand]
+        self.players_played_cards_indexes = [
+            x for played in game.players_played_cards_indexes
+            for x in played]
+        self.players_card_indexes = [
+            x for card_indexes in game.players_card_indexes
+            for x in card_indexes]
+        self.players_hand_masks = tuple(game.players_hand_masks)
+        self.players_played_masks = tuple(game.players_played_masks)
+        self.players_observed_cards_in_round = [
+            x for observed in game.players_observed_cards_in_round
+            for x in observed]
+        self.players_void_colors = tuple(game.players_void_colors)
+        self.players_pred_folds = tuple(game.players_pred_folds)
+        self.players_won_folds = tuple(game.players_won_folds)
+        self.players_scores = tuple(game.players_scores)
+        self.fold_cards = tuple(game.fold_cards)
+
+    def restore(self, game):
+        '''
+        Write the state back into 'game'. Every list given to the game is
+        a new object, so the state can be restored again after the game
+        has been played from it.
+        '''
+        nb_players = self.nb_players
+        hand_size = self.game_round
+        nb_cards = Deck.number_of_cards
+        game.game_round = self.game_round
+        game.first_round_player = self.first_round_player
+        game.first_player = self.first_player
+        game.chosen_color = self.chosen_color
+        game.mode_playout = self.mode_playout
+        game.chckpt_bid = self.chckpt_bid
+        game.chckpt_fold = self.chckpt_fold
+        game.chckpt_player_turn = self.chckpt_player_turn
+        game.public_info_hash = self.public_info_hash
+        game.players_hand_hashes = list(self.players_hand_hashes)
+        cards = self.players_cards
+        played = self.players_played_cards_indexes
+        observed = self.players_observed_cards_in_round
+        game.players_cards = [
+            cards[i * hand_size:(i + 1) * hand_size]
+            for i in range(nb_players)]
+        game.players_played_cards_indexes = [
+            played[i * hand_size:(i + 1) * hand_size]
+            for i in range(nb_players)]
+        card_indexes = self.players_card_indexes
+        game.players_card_indexes = [
+            card_indexes[i * hand_size:(i + 1) * hand_size]
+            for i in range(nb_players)]
+        game.players_hand_masks = list(self.players_hand_masks)
+        game.players_played_masks = list(self.players_played_masks)
+        game.players_observed_cards_in_round = [
+            observed[i * nb_cards:(i + 1) * nb_cards]
+            for i in range(nb_players)]
+        game.players_void_colors = list(self.players_void_colors)
+        game.players_pred_folds = list(self.players_pred_folds)
+        game.players_won_folds = list(self.players_won_folds)
+        game.players_scores = list(self.players_scores)
+        game.fold_cards = list(self.fold_cards)
+
+    def to_bytes(self) -> bytes:
+        '''
+        Fixed-layout binary encoding of the state: STATE_HEADER.size +
+        nb_players * STATE_PLAYER.size bytes (262 for 6 players).
+        '''
+        nb_players = self.nb_players
+        hand_size = self.game_round
+        nb_cards = Deck.number_of_cards
+        if hand_size > MAX_HAND_SIZE:
+            raise ValueError(
+                f'game_round {hand_size} is over {MAX_HAND_SIZE}.')
+        card2index = Deck.card2index
+        data = bytearray(STATE_HEADER.size + nb_players * STATE_PLAYER.size)
+        STATE_HEADER.pack_into(
+            data, 0, STATE_MAGIC, STATE_VERSION, nb_players, hand_size,
+            self.first_round_player,
+            NO_PLAYER if self.first_player is None else self.first_player,
+            get_color_code(self.chosen_color), self.mode_playout,
+            self.chckpt_bid, self.chckpt_fold, self.chckpt_player_turn,
+            self.public_info_hash)
+        for p_id in range(nb_players):
+            cards = self.players_cards[
+                p_id * hand_size:(p_id + 1) * hand_size]
+            played = self.players_played_cards_indexes[
+                p_id * hand_size:(p_id + 1) * hand_size]
+            observed = self.players_observed_cards_in_round[
+                p_id * nb_cards:(p_id + 1) * nb_cards]
+            STATE_PLAYER.pack_into(
+                data, STATE_HEADER.size + p_id * STATE_PLAYER.size,
+                bytes(card2index[card] for card in cards),
+                get_mask(played),
+                get_mask(observed).to_bytes(9, 'little'),
+                bytes(get_color_code(color)
+                      for color in self.players_void_colors[p_id]),
+                self.players_pred_folds[p_id],
+                self.players_won_folds[p_id],
+                self.players_scores[p_id],
+                self.players_hand_hashes[p_id],
+                card2index[self.fold_cards[p_id]]
+                if p_id < len(self.fold_cards) else NO_CARD)
+        return bytes(data)
+
+    @classmethod
+    def from_bytes(cls, data) -> 'GameState':
+        '''
+        State encoded by to_bytes. 'data' can be any buffer (bytes,
+        memoryview of a socket or shared memory buffer...): its fields are
+        unpacked where they are, without a copy of the buffer, into the
+        new lists of the state.
+        '''
+        (magic, version, nb_players, hand_size, first_round_player,
+         first_player, chosen_color, mode_playout, chckpt_bid,
+         chckpt_fold, chckpt_player_turn, public_info_hash) = \
+            STATE_HEADER.unpack_from(data, 0)
+        if magic != STATE_MAGIC or version != STATE_VERSION:
+            raise ValueError(
+                f'not a game state of version {STATE_VERSION} '
+                f'({magic}, version {version}).')
+        cards_list = Deck.cards_list
+        nb_cards = Deck.number_of_cards
+        state = cls.__new__(cls)
+        state.nb_players = nb_players
+        state.game_round = hand_size
+        state.first_round_player = first_round_player
+        state.first_player = \
+            None if first_player == NO_PLAYER else first_player
+        state.chosen_color = get_color(chosen_color)
+        state.mode_playout = bool(mode_playout)
+        state.chckpt_bid = chckpt_bid
+        state.chckpt_fold = chckpt_fold
+        state.chckpt_player_turn = chckpt_player_turn
+        state.public_info_hash = public_info_hash
+        cards = []
+        played = []
+        observed = []
+        void_colors = []
+        pred_folds = []
+        won_folds = []
+        scores = []
+        hand_hashes = []
+        fold_cards = []
+        for p_id in range(nb_players):
+            (hand, played_mask, observed_mask, colors, bid, won, score,
+             hand_hash, fold_card) = STATE_PLAYER.unpack_from(
+                data, STATE_HEADER.size + p_id * STATE_PLAYER.size)
+            cards += [cards_list[i] for i in hand[:hand_size]]
+            played += (
+                BYTE2PLAYED[played_mask & 255]
+                + BYTE2PLAYED[played_mask >> 8])[:hand_size]
+            observed += [
+                x for byte in observed_mask for x in BYTE2OBSERVED[byte]
+                ][:nb_cards]
+            void_colors.append(
+                tuple(get_color(x) for x in colors if x))
+            pred_folds.append(bid)
+            won_folds.append(won)
+            scores.append(score)
+            hand_hashes.append(hand_hash)
+            if fold_card != NO_CARD:
+                fold_cards.append(cards_list[fold_card])
+        state.players_cards = cards
+        state.players_played_cards_indexes = played
+        state.set_masks()
+        state.players_observed_cards_in_round = observed
+        state.players_void_colors = tuple(void_colors)
+        state.players_pred_folds = tuple(pred_folds)
+        state.players_won_folds = tuple(won_folds)
+        state.players_scores = tuple(scores)
+        state.players_hand_hashes = tuple(hand_hashes)
+        state.fold_cards = tuple(fold_cards)
+        return state
+
+    def set_masks(self):
+        '''
+        Card indexes and masks of the players (see Game), computed from
+        their cards.
+        '''
+        # imported here: bitmask_utils imports Game, which imports this
+        # module
+        from bitmask_utils import get_card_indexes, get_mask
+        hand_size = self.game_round
+        card_indexes = []
+        hand_masks = []
+        played_masks = []
+        for p_id in range(self.nb_players):
+            hand = slice(p_id * hand_size, (p_id + 1) * hand_size)
+            player_card_indexes = get_card_indexes(self.players_cards[hand])
+            card_indexes += player_card_indexes
+            hand_masks.append(get_mask(player_card_indexes))
+            played_masks.append(get_mask(
+                card_index for card_index, is_played in zip(
+                    player_card_indexes,
+                    self.players_played_cards_indexes[hand])
+                if is_played))
+        self.players_card_indexes = card_indexes
+        self.players_hand_masks = tuple(hand_masks)
+        self.players_played_masks = tuple(played_masks)
+
+
+def get_mask(values) -> int:
+    '''
+    Mask of a list of 0/1 values (bools), bit i is values[i].
+    '''
+    return int(bytes(values[::-1]).translate(BYTE2DIGIT) or b'0', 2)
+
+
+def get_color_code(color) -> int:
+    return 0 if color is None else COLORS.index(color) + 1
+
+
+def get_color(color_code: int):
+    return None if color_code == 0 else COLORS[color_code - 1]
@@ -1,3 +1,4 @@
+from heapq import heapify, heappush, heappop
 from typing import Type, List
 
 
@@ -34,8 +35,60 @@ class Node():
     def get_children(self):
         return self.children
 
+    def get_child(self, move):
+        for child in self.children:
+            if child.move == move:
+                return child
+        return None
+
     def add_child(self, node: Type['Node']):
         self.children.append(node)
 
+    def create_child(self, move):
+        '''
+        Add a new child playing 'move' and return it.
+        '''
+        node = Node(parent=self, move=move)
+        self.add_child(node)
+        return node
+
     def is_has_child_node(self):
         return len(self.children) > 0
+
+    def get_nb_nodes(self):
+        '''
+        Number of nodes of the tree of this node (itself included).
+        '''
+        nb_nodes = 0
+        nodes = [self]
+        while nodes:
+            node = nodes.pop()
+            nb_nodes += 1
+            nodes += node.children
+        return nb_nodes
+
+    def evict_least_visited(self, max_nodes: int):
+        '''
+        Remove the least visited leaves one after the other (a subtree goes
+        away once its leaves are gone) until the tree of this node has at
+        most 'max_nodes' nodes. Return the number of nodes left.
+        '''
+        leaves = []
+        nb_nodes = 0
+        nodes = [self]
+        while nodes:
+            node = nodes.pop()
+            nb_nodes += 1
+            nodes += node.children
+            if not node.children and node is not self:
+                leaves.append((node.n_visits, id(node), node))
+        heapify(leaves)
+        while nb_nodes > max_nodes and leaves:
+            _, _, node = heappop(leaves)
+            parent = node.parent
+            parent.children.remove(node)
+            node.parent = None
+            nb_nodes -= 1
+            if not parent.children and parent is not self:
+                heappush(leaves, (parent.n_visits, id(parent), parent))
+        return nb_nodes
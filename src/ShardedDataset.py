@@ -0,0 +1,100 @@
+import os
+import json
+
+import numpy as np
+
+
+class ShardedDataset():
+    '''
+    Rows of a NumPy structured dtype written in a directory as shards of
+    'shard_size' rows (shard_00000.npy, ...: .npy files opened as
+    memmaps, so rows go to the disk without being kept in memory) and an
+    index.json file:
+        {'version': 1, 'dtype': [...] (numpy descr), 'shard_size': ...,
+         'shards': [{'path': 'shard_00000.npy', 'nb_rows': ...}, ...],
+         'metadata': {...}}
+    The last shard is only partly filled: readers use the nb_rows of the
+    index. The index is written each time a shard is full and on close,
+    so the shards of an interrupted run can be read.
+    '''
+    VERSION = 1
+    INDEX_NAME = 'index.json'
+
+    def __init__(
+            self, directory: str, dtype: np.dtype, shard_size=100000,
+            metadata=None):
+        if os.path.isfile(os.path.join(directory, self.INDEX_NAME)):
+            raise ValueError(f'{directory} already holds a dataset.')
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.dtype = np.dtype(dtype)
+        self.shard_size = shard_size
+        self.metadata = metadata or {}
+        self.shards = []
+        self.shard = None
+        self.nb_rows = 0
+
+    def write(self, rows: np.ndarray):
+        '''
+        Append 'rows' (an array of the dtype of the dataset).
+        '''
+        i_row = 0
+        while i_row < len(rows):
+            if self.shard is None or self.nb_rows == self.shard_size:
+                self.open_shard()
+            nb_written = min(
+                len(rows) - i_row, self.shard_size - self.nb_rows)
+            self.shard[self.nb_rows:self.nb_rows + nb_written] = \
+                rows[i_row:i_row + nb_written]
+            self.nb_rows += nb_written
+            self.shards[-1]['nb_rows'] = self.nb_rows
+            i_row += nb_written
+
+    def open_shard(self):
+        if self.shard is not None:
+            self.shard.flush()
+            self.write_index()
+        path = f'shard_{len(self.shards):05d}.npy'
+        self.shard = np.lib.format.open_memmap(
+            os.path.join(self.directory, path), mode='w+',
+            dtype=self.dtype, shape=(self.shard_size,))
+        self.shards.append({'path': path, 'nb_rows': 0})
+        self.nb_rows = 0
+
+    def write_index(self):
+        index = {
+            'version': self.VERSION,
+            'dtype': np.lib.format.dtype_to_descr(self.dtype),
+            'shard_size': self.shard_size,
+            'shards': self.shards,
+            'metadata': self.metadata}
+        path = os.path.join(self.directory, self.INDEX_NAME)
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(index, f, indent=1)
+        os.replace(f'{path}.tmp', path)
+
+    def close(self):
+        if self.shard is not None:
+            self.shard.flush()
+            self.shard = None
+        self.write_index()
+
+    @classmethod
+    def read_index(cls, directory: str):
+        with open(os.path.join(directory, cls.INDEX_NAME)) as f:
+            index = json.load(f)
+        if index['version'] != cls.VERSION:
+            raise ValueError(
+                f'dataset version {index["version"]} is not '
+                f'{cls.VERSION}.')
+        return index
+
+    @classmethod
+    def iter_shards(cls, directory: str):
+        '''
+        Filled rows of each shard, as read-only memmaps.
+        '''
+        for shard in cls.read_index(directory)['shards']:
+            yield np.load(
+                os.path.join(directory, shard['path']),
+                mmap_mode='r')[:shard['nb_rows']]
@@ -0,0 +1,167 @@
+import multiprocessing
+from contextlib import nullcontext
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class SharedTree():
+    '''
+    Search tree of parallel_ismcts held in one multiprocessing.shared_memory
+    block, so that the workers of a process pool expand and update the
+    same tree. Same layout as TreeStore (one row per node of each array:
+    parent, first_child, next_sibling, move encoded by
+    TreeStore.encode_move) plus the fields of the search nodes:
+    player_id (-1: root), won_games, n_visits, n_available, and
+    virtual_loss (searches going through the node, not backpropagated
+    yet).
+    Nodes are read without locks. A node is updated under the lock of its
+    stripe (index % nb_stripes), children are added under the lock of the
+    stripe of their parent, and an added node is linked to its parent
+    once its row is written, so readers never see a partial node.
+    The tree has a fixed capacity: once full, add_child returns -1.
+    Workers get the tree when the pool is created (initializer arguments,
+    the locks cannot be sent later).
+    With is_shared=False, the tree is held in the memory of the process,
+    without locks, for a search run in one process.
+    '''
+    arrays_dtypes = {
+        'parent': np.int64,
+        'first_child': np.int64,
+        'next_sibling': np.int64,
+        'move': np.int16,
+        'player_id': np.int8,
+        'won_games': np.float64,
+        'n_visits': np.int64,
+        'n_available': np.int64,
+        'virtual_loss': np.int64,
+    }
+
+    def __init__(self, capacity: int, nb_stripes=64, is_shared=True):
+        self.capacity = capacity
+        # the first 8 bytes hold the number of nodes
+        size = 8 + sum(
+            np.dtype(dtype).itemsize * capacity
+            for dtype in self.arrays_dtypes.values())
+        if is_shared:
+            self.shared_memory = shared_memory.SharedMemory(
+                create=True, size=size)
+            buffer = self.shared_memory.buf
+            self.locks = [multiprocessing.Lock() for _ in range(nb_stripes)]
+            self.nb_nodes_lock = multiprocessing.Lock()
+        else:
+            self.shared_memory = None
+            buffer = bytearray(size)
+            self.locks = [nullcontext()]
+            self.nb_nodes_lock = nullcontext()
+        self.nb_nodes = np.ndarray((1,), dtype=np.int64, buffer=buffer)
+        self.arrays = {}
+        offset = 8
+        for name, dtype in self.arrays_dtypes.items():
+            self.arrays[name] = np.ndarray(
+                (capacity,), dtype=dtype, buffer=buffer, offset=offset)
+            offset += np.dtype(dtype).itemsize * capacity
+        self.reset()
+
+    def close(self):
+        '''
+        Free the shared memory (in the process which created the tree,
+        once the workers are gone).
+        '''
+        self.nb_nodes = None
+        self.arrays = None
+        if self.shared_memory is not None:
+            self.shared_memory.close()
+            self.shared_memory.unlink()
+
+    def reset(self):
+        '''
+        Tree with only a root (not searched by any worker).
+        '''
+        self.nb_nodes[0] = 0
+        self.add_node(-1, -100, -1)
+
+    def get_lock(self, index: int):
+        return self.locks[index % len(self.locks)]
+
+    def add_node(self, parent: int, move: int, player_id: int):
+        '''
+        Row of a new node, -1 if the tree is full. It is not linked to
+        its parent yet.
+        '''
+        with self.nb_nodes_lock:
+            index = int(self.nb_nodes[0])
+            if index == self.capacity:
+                return -1
+            self.nb_nodes[0] = index + 1
+        arrays = self.arrays
+        arrays['parent'][index] = parent
+        arrays['first_child'][index] = -1
+        arrays['next_sibling'][index] = -1
+        arrays['move'][index] = move
+        arrays['player_id'][index] = player_id
+        arrays['won_games'][index] = 0
+        arrays['n_visits'][index] = 0
+        arrays['n_available'][index] = 0
+        arrays['virtual_loss'][index] = 0
+        return index
+
+    def get_child(self, index: int, move: int):
+        '''
+        Child of 'index' playing 'move' (encoded), -1 if none.
+        '''
+        first_child = self.arrays['first_child']
+        next_sibling = self.arrays['next_sibling']
+        moves = self.arrays['move']
+        child = first_child[index]
+        while child >= 0:
+            if moves[child] == move:
+                return int(child)
+            child = next_sibling[child]
+        return -1
+
+    def get_children(self, index: int):
+        first_child = self.arrays['first_child']
+        next_sibling = self.arrays['next_sibling']
+        children = []
+        child = first_child[index]
+        while child >= 0:
+            children.append(int(child))
+            child = next_sibling[child]
+        return children
+
+    def add_child(self, index: int, move: int, player_id: int):
+        '''
+        Child of 'index' playing 'move' (encoded), added if no worker did
+        it first; -1 if the tree is full.
+        '''
+        with self.get_lock(index):
+            child = self.get_child(index, move)
+            if child >= 0:
+                return child
+            child = self.add_node(index, move, player_id)
+            if child >= 0:
+                self.arrays['next_sibling'][child] = \
+                    self.arrays['first_child'][index]
+                self.arrays['first_child'][index] = child
+            return child
+
+    def incr_n_available(self, index: int):
+        with self.get_lock(index):
+            self.arrays['n_available'][index] += 1
+
+    def add_virtual_loss(self, index: int, virtual_loss: int):
+        with self.get_lock(index):
+            self.arrays['virtual_loss'][index] += virtual_loss
+
+    def update(self, index: int, reward: float, virtual_loss: int):
+        '''
+        Backpropagate 'reward' (None: a visit only) and remove the virtual
+        loss added when the node was selected.
+        '''
+        arrays = self.arrays
+        with self.get_lock(index):
+            arrays['n_visits'][index] += 1
+            if reward is not None:
+                arrays['won_games'][index] += reward
+            arrays['virtual_loss'][index] -= virtual_loss
@@ -0,0 +1,45 @@
+from collections import OrderedDict
+
+
+class TranspositionTable():
+    '''
+    Statistics (won games, visits) of the puremcts moves keyed by the hash
+    of the information state they lead to (see zobrist), so that a state
+    reached by different orders of cards, or in different games, shares
+    its statistics. At most 'max_size' entries are kept: the least
+    recently used one is removed first.
+    '''
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        # info_hash -> [won_games, n_visits]
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get_weight(self, info_hash: int, node):
+        '''
+        Weight of the state 'info_hash', or of 'node' if it is not stored.
+        '''
+        entry = self.entries.get(info_hash)
+        if entry is None:
+            return node.get_weight()
+        self.entries.move_to_end(info_hash)
+        return entry[0] / entry[1]
+
+    def update(self, info_hash: int, is_won: bool):
+        '''
+        Backpropagation of a game through the state 'info_hash'. A new
+        entry starts as a new Node (1 won game, 1 visit).
+        '''
+        entry = self.entries.get(info_hash)
+        if entry is None:
+            entry = self.entries[info_hash] = [1, 1]
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        else:
+            self.entries.move_to_end(info_hash)
+        entry[1] += 1
+        if is_won:
+            entry[0] += 1
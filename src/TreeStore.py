@@ -0,0 +1,249 @@
+import os
+from heapq import heapify, heappush, heappop
+
+import numpy as np
+
+from Deck import Deck
+from Node import Node
+
+
+class TreeStore():
+    '''
+    Search tree stored as a struct of NumPy arrays (one row per node):
+    parent, first_child and next_sibling (indexes, -1 if none), move
+    (encoded as an int, see encode_move), won_games and n_visits.
+    Nodes are used through StoredNode views, which have the interface of
+    Node, so puremcts runs on a stored tree as on a tree of Node objects.
+    A store is saved as one .npy file per array in a directory and loaded
+    back as memory-mapped arrays: opening a tree does not read it, and
+    statistics updated in place are written to the files.
+    '''
+    NO_MOVE = -100
+    arrays_dtypes = {
+        'parent': np.int64,
+        'first_child': np.int64,
+        'next_sibling': np.int64,
+        'move': np.int16,
+        'won_games': np.float64,
+        'n_visits': np.int64,
+    }
+
+    def __init__(self, capacity=1024):
+        self.nb_nodes = 0
+        self.arrays = {
+            name: np.empty(capacity, dtype=dtype)
+            for name, dtype in self.arrays_dtypes.items()}
+        self.add_node(parent=-1, move=None)
+
+    @staticmethod
+    def encode_move(move):
+        '''
+        bid -> -1 - bid, card -> Deck.card2index[card]
+        '''
+        if move is None:
+            return TreeStore.NO_MOVE
+        if isinstance(move, tuple):
+            return Deck.card2index[move]
+        return - 1 - move
+
+    @staticmethod
+    def decode_move(code):
+        code = int(code)
+        if code == TreeStore.NO_MOVE:
+            return None
+        if code >= 0:
+            return Deck.cards_list[code]
+        return - 1 - code
+
+    def get_root(self):
+        return StoredNode(self, 0)
+
+    def add_node(self, parent: int, move, won_games=1, n_visits=1):
+        '''
+        Add a node as last child of 'parent' and return its index.
+        '''
+        if self.nb_nodes == len(self.arrays['parent']):
+            # also moves memory-mapped arrays to memory
+            self.arrays = {
+                name: np.concatenate([array, np.empty_like(array)])
+                for name, array in self.arrays.items()}
+        index = self.nb_nodes
+        self.nb_nodes += 1
+        arrays = self.arrays
+        arrays['parent'][index] = parent
+        arrays['first_child'][index] = -1
+        arrays['next_sibling'][index] = -1
+        arrays['move'][index] = self.encode_move(move)
+        arrays['won_games'][index] = won_games
+        arrays['n_visits'][index] = n_visits
+        if parent >= 0:
+            child = arrays['first_child'][parent]
+            if child < 0:
+                arrays['first_child'][parent] = index
+            else:
+                while arrays['next_sibling'][child] >= 0:
+                    child = arrays['next_sibling'][child]
+                arrays['next_sibling'][child] = index
+        return index
+
+    def get_children_indexes(self, index: int):
+        children = []
+        child = self.arrays['first_child'][index]
+        while child >= 0:
+            children.append(int(child))
+            child = self.arrays['next_sibling'][child]
+        return children
+
+    def evict_least_visited(self, max_nodes: int):
+        '''
+        Same eviction as Node.evict_least_visited on the whole tree, then
+        the remaining nodes are compacted (their order, and so the order
+        of siblings, is kept; the root stays at index 0).
+        Return the number of nodes left.
+        '''
+        nb_nodes = self.nb_nodes
+        if nb_nodes <= max_nodes:
+            return nb_nodes
+        parent = self.arrays['parent'][:nb_nodes]
+        n_visits = self.arrays['n_visits'][:nb_nodes]
+        nb_children = np.bincount(parent[1:], minlength=nb_nodes)
+        leaves = [
+            (int(n_visits[i]), int(i))
+            for i in np.flatnonzero(nb_children == 0) if i != 0]
+        heapify(leaves)
+        is_kept = np.ones(nb_nodes, dtype=bool)
+        nb_kept = nb_nodes
+        while nb_kept > max_nodes and leaves:
+            _, index = heappop(leaves)
+            is_kept[index] = False
+            nb_kept -= 1
+            index = int(parent[index])
+            nb_children[index] -= 1
+            if nb_children[index] == 0 and index != 0:
+                heappush(leaves, (int(n_visits[index]), index))
+
+        new_indexes = np.cumsum(is_kept) - 1
+        arrays = {
+            name: array[:nb_nodes][is_kept]
+            for name, array in self.arrays.items()}
+        arrays['parent'][1:] = new_indexes[arrays['parent'][1:]]
+        # links rebuilt from the parents: siblings by increasing index
+        arrays['first_child'][:] = -1
+        arrays['next_sibling'][:] = -1
+        order = np.argsort(arrays['parent'][1:], kind='stable') + 1
+        parents = arrays['parent'][order]
+        is_same_parent = parents[1:] == parents[:-1]
+        arrays['next_sibling'][order[:-1][is_same_parent]] = \
+            order[1:][is_same_parent]
+        is_first = np.concatenate([[True], ~is_same_parent])
+        arrays['first_child'][parents[is_first]] = order[is_first]
+        self.arrays = arrays
+        self.nb_nodes = nb_kept
+        return nb_kept
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        for name, array in self.arrays.items():
+            path = os.path.join(directory, f'{name}.npy')
+            # written next to the file then renamed, so that arrays
+            # memory-mapped from the previous file stay valid
+            np.save(f'{path}.tmp.npy', array[:self.nb_nodes])
+            os.replace(f'{path}.tmp.npy', path)
+
+    @classmethod
+    def load(cls, directory: str, mmap=True):
+        store = cls.__new__(cls)
+        store.arrays = {
+            name: np.load(
+                os.path.join(directory, f'{name}.npy'),
+                mmap_mode='r+' if mmap else None)
+            for name in cls.arrays_dtypes}
+        store.nb_nodes = len(store.arrays['parent'])
+        return store
+
+    @classmethod
+    def from_node(cls, node_root: Node):
+        '''
+        Copy a tree of Node objects into a new store.
+        '''
+        store = cls()
+        store.arrays['won_games'][0] = node_root.won_games
+        store.arrays['n_visits'][0] = node_root.n_visits
+        nodes = [(node_root, 0)]
+        while nodes:
+            node, index = nodes.pop()
+            for child in node.get_children():
+                nodes.append((child, store.add_node(
+                    index, child.get_move(), child.won_games,
+                    child.n_visits)))
+        return store
+
+
+class StoredNode():
+    '''
+    View of the node 'index' of a TreeStore with the interface of Node.
+    '''
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store: TreeStore, index: int):
+        self.store = store
+        self.index = index
+
+    def __eq__(self, other):
+        return (isinstance(other, StoredNode) and other.store is self.store
+                and other.index == self.index)
+
+    def __hash__(self):
+        return hash((id(self.store), self.index))
+
+    @property
+    def won_games(self):
+        return float(self.store.arrays['won_games'][self.index])
+
+    @property
+    def n_visits(self):
+        return int(self.store.arrays['n_visits'][self.index])
+
+    def incr_won_games(self):
+        self.store.arrays['won_games'][self.index] += 1
+
+    def incr_n_visits(self):
+        self.store.arrays['n_visits'][self.index] += 1
+
+    def get_weight(self):
+        return self.won_games / self.n_visits
+
+    def get_parent(self):
+        parent = self.store.arrays['parent'][self.index]
+        if parent < 0:
+            return None
+        return StoredNode(self.store, int(parent))
+
+    def get_move(self):
+        return self.store.decode_move(self.store.arrays['move'][self.index])
+
+    def get_children(self):
+        return [
+            StoredNode(self.store, i)
+            for i in self.store.get_children_indexes(self.index)]
+
+    def get_child(self, move):
+        for child in self.get_children():
+            if child.get_move() == move:
+                return child
+        return None
+
+    def create_child(self, move):
+        return StoredNode(self.store, self.store.add_node(self.index, move))
+
+    def is_has_child_node(self):
+        return self.store.arrays['first_child'][self.index] >= 0
+
+    def get_nb_nodes(self):
+        '''
+        Number of nodes of the store (a view is used for the root only).
+        '''
+        return self.store.nb_nodes
+
+    def evict_least_visited(self, max_nodes: int):
+        return self.store.evict_least_visited(max_nodes)
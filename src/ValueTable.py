@@ -0,0 +1,136 @@
+import numpy as np
+
+from Deck import Deck
+from game_utils import (
+    CARD_KIND, CARD_COLOR, CARD_VALUE, ESCAPE, NUMBER, PIRATE, MERMAID,
+    SKULL_KING)
+from batch_playouts import get_batch_scores
+
+MAX_ROUND = 10
+# Coarse features of a hand: number of cards of each group, capped
+# (a hand with more cards of a group has the key of the cap)
+HAND_FEATURES = {
+    'pirates': (lambda kind, color, value: kind in (PIRATE, SKULL_KING), 3),
+    'mermaids': (lambda kind, color, value: kind == MERMAID, 1),
+    'trumps': (
+        lambda kind, color, value: kind == NUMBER and color == 'black', 3),
+    'high_colors': (
+        lambda kind, color, value:
+            kind == NUMBER and color != 'black' and value >= 10, 3),
+    'escapes': (lambda kind, color, value: kind == ESCAPE, 2),
+}
+# is_in_group[i_feature, card_index]
+IS_IN_GROUP = np.array([
+    [is_in(kind, color, value)
+     for kind, color, value in zip(CARD_KIND, CARD_COLOR, CARD_VALUE)]
+    for is_in, _ in HAND_FEATURES.values()], dtype=np.int8)
+FEATURES_CAPS = np.array([cap for _, cap in HAND_FEATURES.values()])
+
+
+class ValueTable():
+    '''
+    Number of folds won in random rounds (random cards for every player,
+    as in the playouts of play_round) for each round, seat (position of
+    the player in the first fold) and coarse features of the hand dealt
+    (see HAND_FEATURES), built by build_value_table.py.
+    'counts' has the shape (MAX_ROUND + 1, nb_players, *(caps + 1),
+    MAX_ROUND + 1): counts[game_round, seat, *key, k] is the number of
+    simulated hands of this key that won k folds. A key never simulated
+    uses the distribution of all the hands of its round and seat.
+    Saved as one .npy file.
+    '''
+    # Tables loaded by get, by path
+    loaded = {}
+
+    def __init__(self, counts: np.ndarray):
+        self.counts = counts
+        self.nb_players = counts.shape[1]
+        totals = counts.sum(axis=-1, keepdims=True)
+        feature_axes = tuple(range(2, counts.ndim - 1))
+        seat_counts = counts.sum(axis=feature_axes, keepdims=True)
+        seat_totals = np.maximum(seat_counts.sum(axis=-1, keepdims=True), 1)
+        self.probabilities = np.where(
+            totals > 0, counts / np.maximum(totals, 1),
+            seat_counts / seat_totals)
+        # best bid of each round, seat and key, computed at the first use
+        self.round2best_bids = {}
+
+    @classmethod
+    def get(cls, path: str):
+        '''
+        Table of 'path', loaded once per process.
+        '''
+        if path is None:
+            raise ValueError(
+                'config error: value_table_path must be set to use the '
+                'value table.')
+        if path not in cls.loaded:
+            cls.loaded[path] = cls.load(path)
+        return cls.loaded[path]
+
+    @classmethod
+    def load(cls, path: str):
+        return cls(np.load(path))
+
+    def save(self, path: str):
+        np.save(path, self.counts)
+
+    @staticmethod
+    def get_batch_keys(hands: np.ndarray):
+        '''
+        Keys of hands given as card indexes (Deck.cards_list), shape
+        (..., hand_size) -> (..., nb_features).
+        '''
+        return np.minimum(
+            IS_IN_GROUP[:, hands].sum(axis=-1).transpose(
+                *range(1, hands.ndim), 0), FEATURES_CAPS)
+
+    def get_seat(self, game, player_id: int):
+        if game.nb_players != self.nb_players:
+            raise ValueError(
+                f'config error: the value table is built for '
+                f'{self.nb_players} players, not {game.nb_players}.')
+        return (player_id - game.first_round_player) % game.nb_players
+
+    def get_key(self, game, player_id: int):
+        return tuple(self.get_batch_keys(np.array(
+            [Deck.card2index[card]
+             for card in game.players_cards[player_id]])))
+
+    def get_won_folds_probabilities(self, game, player_id: int):
+        '''
+        Probability that 'player_id' wins 0, 1, ... game_round folds with
+        the hand he was dealt.
+        '''
+        return self.probabilities[(
+            game.game_round, self.get_seat(game, player_id),
+            *self.get_key(game, player_id))][:game.game_round + 1]
+
+    def get_best_bids(self, game):
+        '''
+        Bid of best expected score of each seat and key of the round of
+        'game' (array of shape (nb_players, *(caps + 1))).
+        '''
+        game_round = game.game_round
+        if game_round not in self.round2best_bids:
+            folds = np.arange(game_round + 1)
+            # scores[bid, k]
+            scores = get_batch_scores(game, folds[:, None], folds[None, :])
+            self.round2best_bids[game_round] = (
+                self.probabilities[game_round, ..., :game_round + 1]
+                @ scores.T).argmax(axis=-1)
+        return self.round2best_bids[game_round]
+
+    def get_best_bid(self, game, player_id: int):
+        return int(self.get_best_bids(game)[(
+            self.get_seat(game, player_id), *self.get_key(game, player_id))])
+
+    def get_batch_best_bids(self, game, hands: np.ndarray, players):
+        '''
+        Best bids of 'players' for hands of shape
+        (nb_playouts, len(players), game_round).
+        '''
+        seats = [self.get_seat(game, p_id) for p_id in players]
+        keys = self.get_batch_keys(hands)
+        return self.get_best_bids(game)[
+            (np.array(seats)[None, :], *np.moveaxis(keys, -1, 0))]
@@ -0,0 +1,269 @@
+'''
+Vectorized playouts: plays N random ends of the current round at once
+with NumPy arrays of shape (N, nb_players, game_round).
+Cards are handled as indexes of Deck.cards_list (see bitmask_utils).
+The playouts follow play_round in mode_playout: random bids (or the ones
+of the value table, see GameConfig.value_table_playout_bids) for the
+players who did not bid yet, then uniformly random legal cards.
+'''
+import random
+
+import numpy as np
+
+from Game import Game
+from Deck import Deck
+from GameConfig import GameConfig
+from bitmask_utils import get_card_indexes
+import instrumentation
+from game_utils import (
+    get_unseen_cards, get_hidden_positions, CARD_KIND, CARD_VALUE,
+    CARD_COLOR, SPECIAL_BEATS, ESCAPE, NUMBER)
+
+
+# 'chosen_color' codes. The 3 colors to follow come first.
+COLOR2CODE = {'red': 0, 'blue': 1, 'yellow': 2, 'black': 3,
+              None: -1, 'incolor': 4}
+SPECIAL_CODE = 5
+CARD_KIND_ARRAY = np.array(CARD_KIND, dtype=np.int8)
+CARD_VALUE_ARRAY = np.array(CARD_VALUE, dtype=np.int8)
+CARD_COLOR_ARRAY = np.array(
+    [SPECIAL_CODE if color is None else COLOR2CODE[color]
+     for color in CARD_COLOR], dtype=np.int8)
+SPECIAL_BEATS_ARRAY = np.array(SPECIAL_BEATS, dtype=bool)
+
+
+def get_rng(seed=None):
+    '''
+    Without seed, the generator is seeded from the 'random' module so that
+    a seeded game stays reproducible.
+    '''
+    if seed is None:
+        seed = random.getrandbits(64)
+    return np.random.default_rng(seed)
+
+
+def get_batch_scores(game: Game, predicted_wins, actual_wins):
+    '''
+    Vectorized game_utils.get_score.
+    '''
+    return np.where(
+        predicted_wins == 0,
+        np.where(actual_wins == 0, 10, -10) * game.game_round,
+        np.where(
+            predicted_wins == actual_wins,
+            20 * predicted_wins,
+            - 10 * np.abs(predicted_wins - actual_wins)))
+
+
+def deal_determinizations(game: Game, player_id: int, hands, rng):
+    '''
+    Replace, in each playout, the cards not played yet by the other players
+    by cards drawn from the cards unseen by 'player_id', with the same
+    constraints as game_utils.get_determinizations: the draws of one
+    playout are disjoint and a player gets cards of a color he did not
+    follow only if there are not enough other cards.
+    '''
+    nb_playouts = hands.shape[0]
+    pool = np.array(
+        get_card_indexes(get_unseen_cards(game, player_id)), dtype=np.int8)
+    hidden_positions = get_hidden_positions(game, player_id)
+    nb_positions = sum(len(x) for _, x in hidden_positions)
+    if not nb_positions:
+        return
+    if nb_positions > len(pool):
+        raise ValueError(
+            f'Cannot deal {nb_positions} cards from a pool of '
+            f'{len(pool)} unseen cards.')
+    rows = np.arange(nb_playouts)[:, None]
+    # cards are drawn by increasing key: random keys in [0, 1), then the
+    # cards of void colors, then the cards already dealt
+    keys = rng.random((nb_playouts, len(pool)))
+    pool_colors = CARD_COLOR_ARRAY[pool]
+    for p_id, positions in hidden_positions:
+        if not positions:
+            continue
+        player_keys = keys
+        void_colors = [
+            COLOR2CODE[color] for color in game.players_void_colors[p_id]]
+        if void_colors:
+            player_keys = keys + np.isin(pool_colors, void_colors) * 2
+        draws = np.argpartition(
+            player_keys, len(positions) - 1, axis=1)[:, :len(positions)]
+        hands[:, p_id, positions] = pool[draws]
+        keys[rows, draws] = 4
+
+
+def play_batch_card(hands, played, chosen_color, players, rng):
+    '''
+    Each player of 'players' (one per playout) plays a random legal card.
+    Return the played card indexes.
+    '''
+    rows = np.arange(hands.shape[0])
+    player_hands = hands[rows, players]
+    remaining = ~played[rows, players]
+    colors = CARD_COLOR_ARRAY[player_hands]
+    is_color = colors == chosen_color[:, None]
+    # A player must follow the color of the round if he can
+    # 'black' and special cards are not concerned.
+    is_follow = (
+        (chosen_color >= 0) & (chosen_color <= 2)
+        & (remaining & is_color).any(axis=1))
+    legal = remaining & (
+        ~is_follow[:, None] | is_color | (colors == SPECIAL_CODE))
+    keys = rng.random(legal.shape)
+    keys[~legal] = -1
+    choices = keys.argmax(axis=1)
+    played[rows, players, choices] = True
+    cards = player_hands[rows, choices]
+
+    # Set the color for the fold if not already set
+    is_unset = chosen_color == COLOR2CODE[None]
+    kinds = CARD_KIND_ARRAY[cards]
+    chosen_color[is_unset & (kinds == NUMBER)] = \
+        CARD_COLOR_ARRAY[cards][is_unset & (kinds == NUMBER)]
+    chosen_color[is_unset & (kinds > NUMBER)] = COLOR2CODE['incolor']
+    return cards
+
+
+def get_batch_index_winner_card(fold_cards):
+    '''
+    Vectorized game_utils.get_index_winner_card_index, for folds of shape
+    (N, nb_players).
+    '''
+    nb_playouts = fold_cards.shape[0]
+    winning_kind = np.full(nb_playouts, ESCAPE, dtype=np.int8)
+    winning_index = np.zeros(nb_playouts, dtype=np.int64)
+    best_index = np.zeros(nb_playouts, dtype=np.int64)
+    best_black_value = np.full(nb_playouts, -1, dtype=np.int8)
+    best_value = np.full(nb_playouts, -1, dtype=np.int8)
+    chosen_color = np.full(nb_playouts, -1, dtype=np.int8)
+    for i in range(fold_cards.shape[1]):
+        cards = fold_cards[:, i]
+        kinds = CARD_KIND_ARRAY[cards]
+        colors = CARD_COLOR_ARRAY[cards]
+        values = CARD_VALUE_ARRAY[cards]
+        is_number = kinds == NUMBER
+        is_first = is_number & (chosen_color < 0)
+        chosen_color[is_first] = colors[is_first]
+        is_black = is_number & (colors == COLOR2CODE['black'])
+        is_best = is_black & (values > best_black_value)
+        best_black_value[is_best] = values[is_best]
+        best_index[is_best] = i
+        is_best = (
+            is_number & ~is_black & (colors == chosen_color)
+            & (best_black_value < 0) & (values >= best_value))
+        best_value[is_best] = values[is_best]
+        best_index[is_best] = i
+        is_best = SPECIAL_BEATS_ARRAY[winning_kind, kinds]
+        winning_kind[is_best] = kinds[is_best]
+        winning_index[is_best] = i
+    return np.where(winning_kind == ESCAPE, best_index, winning_index)
+
+
+def play_batch_round(
+        game: Game, player_id: int, nb_playouts: int,
+        move=None, phase=None, rng=None):
+    '''
+    Play 'nb_playouts' random ends of the current round of 'game' from the
+    point of view of 'player_id' once he has played 'move' (a bid or the
+    index of a card in his hand, depending on 'phase').
+    If 'player_id' is not a cheater, the hands of the other players are
+    replaced in each playout (see deal_determinizations).
+    The game is not modified.
+    Return the predicted and won folds of each player in each playout,
+    as two arrays of shape (nb_playouts, nb_players).
+    '''
+    if rng is None:
+        rng = get_rng()
+    nb_players = game.nb_players
+    rows = np.arange(nb_playouts)
+
+    hands = np.empty(
+        (nb_playouts, nb_players, game.game_round), dtype=np.int8)
+    hands[:] = [get_card_indexes(cards) for cards in game.players_cards]
+    played = np.empty(hands.shape, dtype=bool)
+    played[:] = game.players_played_cards_indexes
+    if not game.player_id2is_cheater[player_id]:
+        deal_determinizations(game, player_id, hands, rng)
+        if instrumentation.enabled:
+            instrumentation.incr('determinizations', nb_playouts)
+    if instrumentation.enabled:
+        instrumentation.incr('playouts', nb_playouts)
+        instrumentation.incr(
+            'fold_resolutions',
+            nb_playouts * (game.game_round - game.chckpt_fold))
+
+    pred_folds = np.empty((nb_playouts, nb_players), dtype=np.int64)
+    pred_folds[:] = game.players_pred_folds
+    won_folds = np.empty((nb_playouts, nb_players), dtype=np.int64)
+    won_folds[:] = game.players_won_folds
+    fold_cards = np.empty((nb_playouts, nb_players), dtype=np.int8)
+    fold_cards[:, :len(game.fold_cards)] = [
+        Deck.card2index[card] for card in game.fold_cards]
+    chosen_color = np.full(
+        nb_playouts, COLOR2CODE[game.chosen_color], dtype=np.int8)
+    first_player = np.full(nb_playouts, game.first_player, dtype=np.int64)
+    first_fold = game.chckpt_fold
+    first_turn = game.chckpt_player_turn
+
+    # Phase 1: Bid
+    if phase == 'bid':
+        pred_folds[:, player_id] = move
+    bidders = [
+        p_id for p_id in range(game.chckpt_bid, nb_players)
+        if not (phase == 'bid' and p_id == player_id)]
+    if bidders and GameConfig.value_table_playout_bids:
+        # imported here: ValueTable uses the functions of this module
+        from ValueTable import ValueTable
+        pred_folds[:, bidders] = ValueTable.get(
+            GameConfig.value_table_path).get_batch_best_bids(
+                game, hands[:, bidders], bidders)
+    elif bidders:
+        pred_folds[:, bidders] = rng.integers(
+            0, game.game_round + 1, size=(nb_playouts, len(bidders)))
+
+    # The card of 'player_id' is the same in every playout
+    if phase == 'play_card':
+        played[:, player_id, move] = True
+        fold_cards[:, first_turn - 1] = hands[0, player_id, move]
+        card = game.players_cards[player_id][move]
+        if game.chosen_color is None:
+            if str(card[0]).isnumeric():
+                chosen_color[:] = COLOR2CODE[card[1]]
+            elif card[0] != 'escape':
+                chosen_color[:] = COLOR2CODE['incolor']
+    elif phase != 'bid':
+        raise ValueError(
+            f"'phase: {phase}'"
+            "Parameter 'phase must have been set to 'bid' or"
+            "'play_card'.")
+
+    # Phase 2: Play cards
+    for i_fold in range(first_fold, game.game_round):
+        if i_fold != first_fold:
+            first_turn = 0
+        if first_turn == 0:
+            chosen_color[:] = COLOR2CODE[None]
+        for i_turn in range(first_turn, nb_players):
+            fold_cards[:, i_turn] = play_batch_card(
+                hands, played, chosen_color,
+                (first_player + i_turn) % nb_players, rng)
+        player_who_won = (
+            first_player + get_batch_index_winner_card(fold_cards)
+            ) % nb_players
+        first_player = player_who_won
+        won_folds[rows, player_who_won] += 1
+    return pred_folds, won_folds
+
+
+def get_batch_playout_scores(
+        game: Game, player_id: int, nb_playouts: int,
+        move=None, phase=None, rng=None):
+    '''
+    Score of 'player_id' at the end of the round in each playout
+    (what flatmc reads in game.players_scores after play_round).
+    '''
+    pred_folds, won_folds = play_batch_round(
+        game, player_id, nb_playouts, move, phase, rng)
+    return game.players_scores[player_id] + get_batch_scores(
+        game, pred_folds[:, player_id], won_folds[:, player_id])
@@ -0,0 +1,264 @@
+'''
+Throughput of the hot paths of the engine, with fixed seeds:
+get_legal_moves (of bitmask_utils, used by play_round), the fold
+resolvers (get_index_winner_card_index used by play_round, and the
+legacy get_index_winner_card as its baseline), play_card, play_round
+playouts, flatmc decisions per round and main.main games per hour.
+Every result is a rate (higher is better), the best of 5 runs (3 with
+--quick). The results are printed and written as JSON; with --compare,
+they are checked against a baseline JSON written by a previous run and
+the ones slower by more than the tolerance are flagged as regressions
+(the exit code is then 1).
+usage:
+    python benchmark.py [--output FILE] [--compare BASELINE]
+                        [--tolerance 0.1] [--quick]
+'''
+import sys
+import json
+import random
+import argparse
+import platform
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+from GameConfig import GameConfig
+from Game import Game
+from Deck import Deck
+from game_utils import (
+    get_index_winner_card, get_index_winner_card_index, play_card)
+from bitmask_utils import get_legal_moves
+import game_logic
+import main
+from recorded_states import get_decision_states
+
+SEED = 0
+
+
+def get_config_dict(**overrides):
+    config = {
+        k: v for k, v in vars(GameConfig).items() if not k.startswith('__')}
+    config.update(overrides)
+    return config
+
+
+def get_rate(nb_operations: int, duration: float):
+    return nb_operations / duration if duration > 0 else float('inf')
+
+
+def bench_get_legal_moves(states, game: Game):
+    duration = 0
+    nb_calls = 0
+    for state, player_id, _, phase in states:
+        if phase != 'play_card':
+            continue
+        game.restore(state)
+        start_time = perf_counter()
+        for _ in range(10):
+            get_legal_moves(game, player_id)
+        duration += perf_counter() - start_time
+        nb_calls += 10
+    return get_rate(nb_calls, duration)
+
+
+def bench_get_index_winner_card(nb_folds: int):
+    '''
+    Rate of each fold resolver on the same random folds: 'legacy' (cards)
+    and 'index' (card indexes).
+    '''
+    random.seed(SEED)
+    folds = [
+        random.sample(Deck.cards_list, random.randint(2, 6))
+        for _ in range(nb_folds)]
+    folds_indexes = [
+        tuple(Deck.card2index[card] for card in fold) for fold in folds]
+    rates = {}
+    start_time = perf_counter()
+    for fold in folds:
+        get_index_winner_card(fold)
+    rates['legacy'] = get_rate(nb_folds, perf_counter() - start_time)
+    start_time = perf_counter()
+    for fold in folds_indexes:
+        get_index_winner_card_index(fold)
+    rates['index'] = get_rate(nb_folds, perf_counter() - start_time)
+    return rates
+
+
+def bench_play_card(states, game: Game):
+    random.seed(SEED)
+    duration = 0
+    nb_calls = 0
+    for state, player_id, _, phase in states:
+        if phase != 'play_card':
+            continue
+        game.restore(state)
+        action = random.choice(get_legal_moves(game, player_id))
+        start_time = perf_counter()
+        play_card(game, player_id, action)
+        duration += perf_counter() - start_time
+        nb_calls += 1
+    return get_rate(nb_calls, duration)
+
+
+def bench_playouts(states, game: Game):
+    '''
+    Random ends of round played by play_round from each state.
+    '''
+    random.seed(SEED)
+    duration = 0
+    for state, player_id, _, phase in states:
+        game.restore(state)
+        # the decision of the state is made by the playout
+        if phase == 'bid':
+            game.chckpt_bid = player_id
+        else:
+            game.chckpt_player_turn -= 1
+        game.mode_playout = True
+        start_time = perf_counter()
+        game_logic.play_round(game)
+        duration += perf_counter() - start_time
+    return get_rate(len(states), duration)
+
+
+def bench_flatmc(nb_decisions: int, nb_iterations=20):
+    '''
+    flatmc decisions per second of a non-cheater player, for each round
+    (bid and card decisions of random rounds).
+    '''
+    config = get_config_dict(
+        nb_players=2,
+        player_id2type_player={0: 'mcts', 1: 'random'},
+        player_id2nb_of_iterations={0: nb_iterations, 1: None},
+        player_id2is_cheater={0: False, 1: False},
+        player_id2time_budget_ms={0: None, 1: None},
+        player_id2allocation={0: 'uniform', 1: 'uniform'},
+        player_id2mcts_type={0: 'flatmc'})
+    rates = {}
+    for game_round in range(1, 11):
+        random.seed(SEED)
+        game = Game(**config)
+        game.game_round = game_round
+        nb_done = 0
+        duration = 0
+        while nb_done < nb_decisions:
+            game_logic.init_round(game)
+            state = game.snapshot()
+            start_time = perf_counter()
+            game_logic.mcts(game, 0, phase='bid')
+            game.restore(state)
+            game.players_pred_folds = [0] * game.nb_players
+            game.chckpt_bid = game.nb_players
+            game.first_player = 0
+            game.chckpt_player_turn = 1
+            game.chosen_color = None
+            game.fold_cards = []
+            game_logic.mcts(
+                game, 0, get_legal_moves(game, 0), phase='play_card')
+            duration += perf_counter() - start_time
+            nb_done += 2
+        rates[game_round] = get_rate(nb_done, duration)
+    return rates
+
+
+def bench_main(nb_games: int):
+    '''
+    Games per hour of main.main with the default configuration.
+    '''
+    overrides = {'csv_name': None, 'nb_games': nb_games, 'seed': SEED}
+    previous_values = {k: getattr(GameConfig, k) for k in overrides}
+    with tempfile.TemporaryDirectory() as directory:
+        overrides['csv_name'] = str(Path(directory) / 'games.csv')
+        for k, v in overrides.items():
+            setattr(GameConfig, k, v)
+        try:
+            start_time = perf_counter()
+            main.main(GameConfig)
+            duration = perf_counter() - start_time
+        finally:
+            for k, v in previous_values.items():
+                setattr(GameConfig, k, v)
+    return get_rate(nb_games, duration) * 3600
+
+
+def get_best(bench, *args, nb_repeats=3):
+    '''
+    Best result of 'nb_repeats' runs of 'bench' (each run is seeded the
+    same way), the least disturbed by the rest of the machine.
+    '''
+    results = [bench(*args) for _ in range(nb_repeats)]
+    if isinstance(results[0], dict):
+        return {k: max(x[k] for x in results) for k in results[0]}
+    return max(results)
+
+
+def run_benchmarks(quick=False):
+    scale = 1 if quick else 5
+    nb_repeats = 3 if quick else 5
+    game, states = get_decision_states(3, 40 * scale, SEED)
+    results = {
+        'get_legal_moves_per_s': get_best(
+            bench_get_legal_moves, states, game, nb_repeats=nb_repeats),
+        'play_card_per_s': get_best(
+            bench_play_card, states, game, nb_repeats=nb_repeats),
+        'play_round_playouts_per_s': get_best(
+            bench_playouts, states, game, nb_repeats=nb_repeats),
+    }
+    resolver2rate = get_best(
+        bench_get_index_winner_card, 20000 * scale, nb_repeats=nb_repeats)
+    # the legacy resolver keeps the name of the baselines written before
+    # play_round used the index resolver
+    results['get_index_winner_card_per_s'] = resolver2rate['legacy']
+    results['get_index_winner_card_index_per_s'] = resolver2rate['index']
+    for game_round, rate in get_best(
+            bench_flatmc, 4 * scale, nb_repeats=nb_repeats).items():
+        results[f'flatmc_round_{game_round}_decisions_per_s'] = rate
+    results['main_games_per_hour'] = get_best(
+        bench_main, 2 * scale, nb_repeats=nb_repeats)
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float):
+    '''
+    Print the change of each result against the baseline and return the
+    names of the regressions.
+    '''
+    regressions = []
+    for name, value in results.items():
+        if name not in baseline:
+            print(f'{name}: {value:.1f} (not in baseline)')
+            continue
+        ratio = value / baseline[name]
+        flag = ''
+        if ratio < 1 - tolerance:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f'{name}: {value:.1f} vs {baseline[name]:.1f} '
+              f'({ratio - 1:+.1%}){flag}')
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark the hot paths of the engine.')
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--compare', default=None, metavar='BASELINE')
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    parser.add_argument('--quick', action='store_true')
+    args = parser.parse_args()
+
+    GameConfig.log_level = 'WARNING'
+    results = run_benchmarks(args.quick)
+    game_logic.close_decision_pool()
+    with open(args.output, 'w') as f:
+        json.dump({
+            'python': platform.python_version(),
+            'quick': args.quick,
+            'results': results}, f, indent=2)
+    if args.compare is None:
+        for name, value in results.items():
+            print(f'{name}: {value:.1f}')
+    else:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
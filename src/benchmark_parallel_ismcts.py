@@ -0,0 +1,123 @@
+'''
+Scaling of parallel_ismcts: for each number of workers, parallel_ismcts
+plays against flatmc with the same time budget per decision, without
+seeing the other hands. Games are played by pairs on the same deals (see
+DeckService) with the seats swapped, so that the luck of the deals
+cancels out. Prints, for each number of workers, the mean score of each
+algorithm, the number of games won by each, the mean score difference of
+the pairs with its standard error, the iterations per second of each
+algorithm and the iterations per second of parallel_ismcts relative to
+one worker (the search in one process).
+usage: python benchmark_parallel_ismcts.py [nb_games] [time_budget_ms]
+                                           [max_nb_workers]
+'''
+import sys
+import os
+import random
+from math import sqrt
+from time import perf_counter
+
+from tqdm import tqdm
+
+from GameConfig import GameConfig
+from Game import Game
+from DeckService import DeckService
+import game_logic
+
+
+def run_benchmark(
+        nb_games=20, time_budget_ms=20, seed=0,
+        algos=('parallel_ismcts', 'flatmc')):
+    random.seed(seed)
+    deals_seeds = [random.getrandbits(32) for _ in range((nb_games + 1) // 2)]
+    sum_scores = {algo: 0 for algo in algos}
+    nb_victories = {algo: 0 for algo in algos}
+    nb_iterations = {algo: 0 for algo in algos}
+    search_time = {algo: 0 for algo in algos}
+    # score of algos[0] minus score of algos[1] in each pair of games
+    pairs_differences = [0 for _ in deals_seeds]
+
+    mcts = game_logic.mcts
+
+    def measured_mcts(game, player_id, legal_moves=None, phase=None):
+        move = mcts(game, player_id, legal_moves, phase)
+        algo = game.player_id2mcts_type[player_id]
+        nb_iterations[algo] += game.search_info['nb_iterations']
+        search_time[algo] += game.search_info['time_ms'] / 1000
+        return move
+
+    game_logic.mcts = measured_mcts
+    try:
+        for i_game in tqdm(range(nb_games)):
+            player_id2mcts_type = {
+                i_game % 2: algos[0], (i_game + 1) % 2: algos[1]}
+            config = {
+                k: v for k, v in vars(GameConfig).items()
+                if not k.startswith('__')}
+            config.update({
+                'nb_players': 2,
+                'player_id2type_player': {0: 'mcts', 1: 'mcts'},
+                'player_id2mcts_type': player_id2mcts_type,
+                'player_id2nb_of_iterations': {0: None, 1: None},
+                'player_id2time_budget_ms': {
+                    0: time_budget_ms, 1: time_budget_ms},
+                'player_id2is_cheater': {0: False, 1: False},
+                'player_id2allocation': {0: 'uniform', 1: 'uniform'}})
+            game = Game(
+                deck_service=DeckService(deals_seeds[i_game // 2]), **config)
+            # the same hands lead in the two games of a pair
+            game.first_round_player = deals_seeds[i_game // 2] % 2
+            game_logic.play_game(game)
+            for player_id, algo in player_id2mcts_type.items():
+                sum_scores[algo] += game.players_scores[player_id]
+                pairs_differences[i_game // 2] += \
+                    game.players_scores[player_id] * (
+                        1 if algo == algos[0] else -1)
+            winner = max(range(2), key=lambda x: game.players_scores[x])
+            nb_victories[player_id2mcts_type[winner]] += 1
+    finally:
+        game_logic.mcts = mcts
+
+    for algo in algos:
+        print(
+            f'{algo}: mean score {sum_scores[algo] / nb_games:.1f}, '
+            f'victories {nb_victories[algo]}/{nb_games}, '
+            f'{nb_iterations[algo] / search_time[algo]:.0f} iterations/s')
+    nb_pairs = len(pairs_differences)
+    mean_difference = sum(pairs_differences) / nb_pairs
+    standard_error = sqrt(
+        sum((x - mean_difference) ** 2 for x in pairs_differences)
+        / max(nb_pairs - 1, 1) / nb_pairs)
+    print(
+        f'{algos[0]} - {algos[1]}: {mean_difference:+.1f} points per pair '
+        f'of games (standard error {standard_error:.1f})')
+    return {
+        algo: nb_iterations[algo] / search_time[algo] for algo in algos}
+
+
+def run_scaling(nb_games=20, time_budget_ms=50, max_nb_workers=None):
+    if max_nb_workers is None:
+        max_nb_workers = os.cpu_count()
+    nb_decision_workers = GameConfig.nb_decision_workers
+    nb_workers = 1
+    try:
+        while nb_workers <= max_nb_workers:
+            print(f'{nb_workers} worker(s):')
+            GameConfig.nb_decision_workers = nb_workers
+            rates = run_benchmark(nb_games, time_budget_ms)
+            # a new pool for the next number of workers
+            game_logic.close_decision_pool()
+            if nb_workers == 1:
+                single_rate = rates['parallel_ismcts']
+            print(f'iterations/s ratio: '
+                  f'{rates["parallel_ismcts"] / single_rate:.2f}')
+            nb_workers *= 2
+    finally:
+        GameConfig.nb_decision_workers = nb_decision_workers
+        game_logic.close_decision_pool()
+
+
+if __name__ == '__main__':
+    start_time = perf_counter()
+    run_scaling(*[int(x) for x in sys.argv[1:4]])
+    print(f'{perf_counter() - start_time:.1f} s')
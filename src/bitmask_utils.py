@@ -0,0 +1,132 @@
+'''
+Bitmask representation of the cards of a round.
+
+A set of cards is a python int where bit i stands for the card
+Deck.cards_list[i]. Every copy of a duplicated card (escape, pirate,
+mermaid) has its own bit in hands, so a hand holding two escapes has two
+bits set.
+The hand and played masks of each player are kept on the game
+(players_hand_masks, players_played_masks, with players_card_indexes):
+set when the cards are dealt or replaced (set_player_masks), updated by
+game_utils.play_card and saved by GameState.
+Observed cards follow 'players_observed_cards_in_round' and are keyed on
+Deck.card2index: all the copies of a duplicated card share the bit of the
+last copy.
+The functions give the same results as their list-based counterparts in
+game_utils.
+'''
+from Game import Game
+from Deck import Deck
+
+
+COLORS = ('red', 'blue', 'yellow', 'black')
+FULL_MASK = (1 << Deck.number_of_cards) - 1
+# color -> mask of every numbered card of this color
+COLOR2MASK = {
+    color: sum(
+        1 << i for i, card in enumerate(Deck.cards_list)
+        if card[1] == color)
+    for color in COLORS}
+# escape, pirate, mermaid, skull king: can always be played
+SPECIAL_MASK = sum(
+    1 << i for i, card in enumerate(Deck.cards_list) if card[1] is None)
+
+
+def get_card_indexes(cards: list):
+    '''
+    Return the index in Deck.cards_list of each card of 'cards'.
+    Duplicated cards get the index of a different copy each time.
+    '''
+    next_copy = {}
+    card_indexes = []
+    for card in cards:
+        copy = next_copy.get(card, 0)
+        card_indexes.append(Deck.card2indexes[card][copy])
+        next_copy[card] = copy + 1
+    return card_indexes
+
+
+def get_mask(card_indexes):
+    mask = 0
+    for card_index in card_indexes:
+        mask |= 1 << card_index
+    return mask
+
+
+def get_card_indexes_from_mask(mask: int):
+    card_indexes = []
+    while mask:
+        lowest_bit = mask & -mask
+        card_indexes.append(lowest_bit.bit_length() - 1)
+        mask ^= lowest_bit
+    return card_indexes
+
+
+def get_cards_from_mask(mask: int):
+    return [Deck.cards_list[i] for i in get_card_indexes_from_mask(mask)]
+
+
+def set_player_masks(game: Game, player_id: int):
+    '''
+    Set players_card_indexes, players_hand_masks and players_played_masks
+    of 'player_id' from his cards, once they are dealt or replaced
+    (play_card then keeps the played mask up to date).
+    '''
+    card_indexes = get_card_indexes(game.players_cards[player_id])
+    played = game.players_played_cards_indexes[player_id]
+    game.players_card_indexes[player_id] = card_indexes
+    game.players_hand_masks[player_id] = get_mask(card_indexes)
+    game.players_played_masks[player_id] = get_mask(
+        card_index for i, card_index in enumerate(card_indexes)
+        if played[i])
+
+
+def get_player_masks(game: Game, player_id: int):
+    '''
+    Return (hand_mask, played_mask, observed_mask) of a player.
+    '''
+    observed_mask = get_mask(
+        i for i, x in enumerate(
+            game.players_observed_cards_in_round[player_id]) if x)
+    return game.players_hand_masks[player_id], \
+        game.players_played_masks[player_id], observed_mask
+
+
+def set_card_as_observed(observed_mask: int, card):
+    return observed_mask | 1 << Deck.card2index[card]
+
+
+def get_unseen_mask(observed_mask: int):
+    '''
+    Cards a player has neither in hand nor seen played (same cards as the
+    ones drawn from by game_utils.get_randomly_generated_player_hand).
+    '''
+    return FULL_MASK & ~observed_mask
+
+
+def is_color_in_mask(mask: int, color):
+    return bool(mask & COLOR2MASK.get(color, 0))
+
+
+def get_legal_moves_mask(hand_mask: int, played_mask: int, chosen_color):
+    remaining_mask = hand_mask & ~played_mask
+    # A player must follow the color of the round if he can
+    # 'black' and special cards are not concerned.
+    if chosen_color not in ['black', None] and \
+            is_color_in_mask(remaining_mask, chosen_color):
+        return remaining_mask & (COLOR2MASK[chosen_color] | SPECIAL_MASK)
+    return remaining_mask
+
+
+def get_legal_moves(game: Game, player_id: int):
+    '''
+    Same as game_utils.get_legal_moves, computed with the masks of the
+    game.
+    '''
+    legal_mask = get_legal_moves_mask(
+        game.players_hand_masks[player_id],
+        game.players_played_masks[player_id], game.chosen_color)
+    return [
+        i for i, card_index in enumerate(
+            game.players_card_indexes[player_id])
+        if legal_mask >> card_index & 1]
@@ -0,0 +1,85 @@
+'''
+Build a ValueTable by simulating random rounds with the vectorized
+playouts of batch_playouts: for each round, 'nb_deals' random deals
+played with random legal cards, the folds won by each hand counted under
+its round, seat and key.
+usage:
+    python build_value_table.py PATH [--nb-players 2] [--nb-deals 200000]
+                                     [--batch-size 20000] [--seed 0]
+'''
+import argparse
+from time import perf_counter
+
+import numpy as np
+
+from Deck import Deck
+from ValueTable import ValueTable, MAX_ROUND, FEATURES_CAPS
+from batch_playouts import (
+    play_batch_card, get_batch_index_winner_card, COLOR2CODE)
+
+
+def play_random_rounds(
+        nb_players: int, game_round: int, nb_deals: int, rng):
+    '''
+    Deal and play 'nb_deals' random rounds, seat 0 playing first.
+    Return the hands (card indexes, shape (nb_deals, nb_players,
+    game_round)) and the folds won (shape (nb_deals, nb_players)).
+    '''
+    rows = np.arange(nb_deals)
+    hands = rng.random((nb_deals, Deck.number_of_cards)).argsort(axis=1)[
+        :, :nb_players * game_round].reshape(
+            nb_deals, nb_players, game_round).astype(np.int8)
+    played = np.zeros(hands.shape, dtype=bool)
+    won_folds = np.zeros((nb_deals, nb_players), dtype=np.int64)
+    fold_cards = np.empty((nb_deals, nb_players), dtype=np.int8)
+    chosen_color = np.empty(nb_deals, dtype=np.int8)
+    first_player = np.zeros(nb_deals, dtype=np.int64)
+    for _ in range(game_round):
+        chosen_color[:] = COLOR2CODE[None]
+        for i_turn in range(nb_players):
+            fold_cards[:, i_turn] = play_batch_card(
+                hands, played, chosen_color,
+                (first_player + i_turn) % nb_players, rng)
+        first_player = (
+            first_player + get_batch_index_winner_card(fold_cards)
+            ) % nb_players
+        won_folds[rows, first_player] += 1
+    return hands, won_folds
+
+
+def build_value_table(
+        nb_players: int, nb_deals: int, batch_size=20000, seed=None):
+    rng = np.random.default_rng(seed)
+    counts = np.zeros(
+        (MAX_ROUND + 1, nb_players, *(FEATURES_CAPS + 1), MAX_ROUND + 1),
+        dtype=np.int64)
+    seats = np.arange(nb_players)[None, :]
+    for game_round in range(1, MAX_ROUND + 1):
+        if nb_players * game_round > Deck.number_of_cards:
+            break
+        for i_deal in range(0, nb_deals, batch_size):
+            hands, won_folds = play_random_rounds(
+                nb_players, game_round, min(batch_size, nb_deals - i_deal),
+                rng)
+            keys = ValueTable.get_batch_keys(hands)
+            np.add.at(counts, (
+                game_round, seats, *np.moveaxis(keys, -1, 0), won_folds), 1)
+    return ValueTable(counts)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Build the value table of random rounds.')
+    parser.add_argument('path')
+    parser.add_argument('--nb-players', type=int, default=2)
+    parser.add_argument('--nb-deals', type=int, default=200000)
+    parser.add_argument('--batch-size', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    start_time = perf_counter()
+    table = build_value_table(
+        args.nb_players, args.nb_deals, args.batch_size, args.seed)
+    table.save(args.path)
+    print(f'{args.nb_deals} deals per round simulated in '
+          f'{perf_counter() - start_time:.1f} s, saved to {args.path}')
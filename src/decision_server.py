@@ -0,0 +1,251 @@
+'''
+Long-lived decision service on a local (unix) socket: bots send the state
+of a game and get the move of an mcts player (flatmc or parallel_ismcts,
+see game_logic.mcts) without starting python or importing the engine at
+each decision.
+The state is the one of the game when play_round asks the player for his
+move (chckpt_* already moved past the decision, as in play_round).
+Requests arriving together are batched: they are split between the
+workers of a process pool started with the server (modules imported,
+GameConfig of the server set), one task per worker and per batch.
+The search runs in the workers, so nb_decision_workers is set to 1 in
+them, and a tree kept between decisions (puremcts) is not available.
+Messages are length-prefixed:
+    request: '>II' (header size, state size), JSON header, GameState
+        bytes (see GameState.to_bytes)
+    response: '>I' (size), JSON {'move': ..., 'search_info': {...}} or
+        {'error': '...'}
+The header gives 'player_id', 'phase' ('bid' or 'play_card') and
+optionally 'legal_moves' (default: get_legal_moves), 'players' (the
+player_id2* attributes of the Game, see Game.get_players_config) and
+'seed' (seeds the random generators of the decision).
+usage:
+    python decision_server.py [--socket skull_king.sock] [--workers N]
+                              [--batch-window-ms 2] [--max-batch-size 64]
+'''
+import json
+import random
+import socket
+import struct
+import asyncio
+import logging
+import argparse
+import multiprocessing
+
+from GameConfig import GameConfig
+from Game import Game
+from game_utils import get_legal_moves
+import game_logic
+import main
+
+REQUEST_HEADER = struct.Struct('>II')
+RESPONSE_HEADER = struct.Struct('>I')
+
+
+def encode_request(
+        game: Game, player_id: int, phase: str, legal_moves=None,
+        seed=None):
+    header = json.dumps({
+        'player_id': player_id, 'phase': phase,
+        'legal_moves': None if legal_moves is None else list(legal_moves),
+        'players': game.get_players_config(), 'seed': seed}).encode()
+    state = game.snapshot().to_bytes()
+    return REQUEST_HEADER.pack(len(header), len(state)) + header + state
+
+
+def decode_request(header: bytes, state: bytes):
+    request = json.loads(header)
+    # JSON object keys are strings
+    request['players'] = {
+        k: {int(p_id): v for p_id, v in x.items()}
+        for k, x in request.get('players', {}).items()}
+    request['state'] = state
+    return request
+
+
+def init_worker(config_dict: dict):
+    '''
+    Initializer of the workers: same GameConfig as the server.
+    '''
+    for k, v in config_dict.items():
+        setattr(GameConfig, k, v)
+    GameConfig.nb_decision_workers = 1
+
+
+def decide(request: dict):
+    '''
+    Move of request['player_id'] in the state of the request.
+    '''
+    player_id = request['player_id']
+    phase = request['phase']
+    if phase not in ('bid', 'play_card'):
+        raise ValueError(f"phase must be 'bid' or 'play_card', not {phase}.")
+    game = game_logic.get_game_from_bytes(
+        request['state'], request['players'])
+    if game.player_id2mcts_type.get(
+            player_id, GameConfig.mcts_type) == 'puremcts':
+        raise ValueError(
+            'config error: the decision server runs flatmc or '
+            'parallel_ismcts.')
+    if request.get('seed') is not None:
+        random.seed(request['seed'])
+    game.mode_playout = False
+    legal_moves = request.get('legal_moves')
+    if phase == 'play_card' and legal_moves is None:
+        legal_moves = get_legal_moves(game, player_id)
+    move = game_logic.mcts(game, player_id, legal_moves, phase)
+    return {'move': move, 'search_info': game.search_info}
+
+
+def decide_batch(requests: list):
+    '''
+    Task of a worker: responses to 'requests', an error only fails its
+    own request.
+    '''
+    responses = []
+    for request in requests:
+        try:
+            responses.append(decide(request))
+        except Exception as e:
+            responses.append({'error': f'{type(e).__name__}: {e}'})
+    return responses
+
+
+class DecisionServer():
+    '''
+    asyncio server batching the requests of its clients onto a process
+    pool of 'nb_workers' workers. A batch is sent once 'batch_window_ms'
+    ms passed after its first request, or once it has 'max_batch_size'
+    requests; the next batch gathers while the workers are busy.
+    '''
+
+    def __init__(
+            self, nb_workers: int, batch_window_ms=2, max_batch_size=64):
+        self.nb_workers = nb_workers
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.pool = multiprocessing.Pool(
+            nb_workers, init_worker, (main.get_config_dict(GameConfig),))
+        self.queue = None
+
+    async def decide(self, request: dict):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((request, future))
+        return await future
+
+    async def run_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            end_time = loop.time() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                timeout = end_time - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(
+                        await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            nb_chunks = min(self.nb_workers, len(batch))
+            chunks = [batch[i::nb_chunks] for i in range(nb_chunks)]
+            try:
+                results = await loop.run_in_executor(
+                    None, self.pool.map, decide_batch,
+                    [[request for request, _ in chunk] for chunk in chunks])
+            except Exception as e:
+                results = [
+                    [{'error': f'{type(e).__name__}: {e}'}] * len(chunk)
+                    for chunk in chunks]
+            for chunk, responses in zip(chunks, results):
+                for (_, future), response in zip(chunk, responses):
+                    if not future.done():
+                        future.set_result(response)
+
+    async def handle_client(self, reader, writer):
+        '''
+        Requests of a connection are answered in order.
+        '''
+        try:
+            while True:
+                try:
+                    header_size, state_size = REQUEST_HEADER.unpack(
+                        await reader.readexactly(REQUEST_HEADER.size))
+                except asyncio.IncompleteReadError:
+                    break
+                header = await reader.readexactly(header_size)
+                state = await reader.readexactly(state_size)
+                try:
+                    response = await self.decide(
+                        decode_request(header, state))
+                except Exception as e:
+                    response = {'error': f'{type(e).__name__}: {e}'}
+                response = json.dumps(response, default=str).encode()
+                writer.write(RESPONSE_HEADER.pack(len(response)) + response)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, socket_path: str):
+        self.queue = asyncio.Queue()
+        batches = asyncio.create_task(self.run_batches())
+        server = await asyncio.start_unix_server(
+            self.handle_client, socket_path)
+        logging.warning(f'Decision server listening on {socket_path}')
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batches.cancel()
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+
+def read_exactly(sock: socket.socket, size: int):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError('decision server closed the connection')
+        data += chunk
+    return data
+
+
+def request_decision(
+        sock: socket.socket, game: Game, player_id: int, phase: str,
+        legal_moves=None, seed=None):
+    '''
+    Client side: move of 'player_id' chosen by the server connected to
+    'sock' (socket.AF_UNIX) in the current state of 'game'.
+    '''
+    sock.sendall(encode_request(game, player_id, phase, legal_moves, seed))
+    size, = RESPONSE_HEADER.unpack(read_exactly(sock, RESPONSE_HEADER.size))
+    response = json.loads(read_exactly(sock, size))
+    if 'error' in response:
+        raise ValueError(f'decision server: {response["error"]}')
+    game.search_info = response['search_info']
+    return response['move']
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Serve the decisions of mcts players on a socket.')
+    parser.add_argument('--socket', default='skull_king.sock')
+    parser.add_argument(
+        '--workers', type=int,
+        default=max(GameConfig.nb_decision_workers, 1))
+    parser.add_argument('--batch-window-ms', type=float, default=2)
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    server = DecisionServer(
+        args.workers, args.batch_window_ms, args.max_batch_size)
+    try:
+        asyncio.run(server.serve(args.socket))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
@@ -0,0 +1,121 @@
+'''
+Exact solver of the end of a round whose hands are all known (the real
+ones for a cheater, a determinization otherwise).
+Every player plays the card maximizing his own score of the round, as
+predicted by the solver for the rest of the round (max^n search, ties go
+to the card of lowest index). Hands are bitmasks of card indexes (see
+bitmask_utils) and folds tuples of Deck.card2index indexes resolved by
+game_utils.get_index_winner_card_index. Results are memoized on the
+remaining hands, the current fold, its first player and the folds won.
+A search can be given a deadline, after which it gives up.
+'''
+from time import perf_counter
+
+from Deck import Deck
+from Game import Game
+from bitmask_utils import (
+    get_card_indexes, get_mask, get_card_indexes_from_mask,
+    get_legal_moves_mask)
+from game_utils import (
+    get_score, get_index_winner_card_index,
+    CARD_KIND, CARD_COLOR, ESCAPE, NUMBER)
+
+
+def get_nb_cards_left(game: Game):
+    '''
+    Number of cards not played yet in the round, all players together.
+    '''
+    return sum(
+        played.count(False) for played in game.players_played_cards_indexes)
+
+
+def get_fold_color(fold: tuple):
+    '''
+    Same chosen_color as play_card for the cards of 'fold'.
+    '''
+    for card_index in fold:
+        if CARD_KIND[card_index] == NUMBER:
+            return CARD_COLOR[card_index]
+        if CARD_KIND[card_index] != ESCAPE:
+            return 'incolor'
+    return None
+
+
+class DeadlineReached(Exception):
+    pass
+
+
+def get_moves_outcomes(
+        game: Game, player_id: int, legal_moves, deadline=None):
+    '''
+    Folds won by each player at the end of the round (tuple) after
+    'player_id' plays each of 'legal_moves' (indexes in his hand), for the
+    hands of 'game'. None if the search is not over at 'deadline' (a
+    perf_counter() value, None: no limit).
+    '''
+    nb_players = game.nb_players
+    bids = game.players_pred_folds
+    players_card_indexes = [
+        get_card_indexes(cards) for cards in game.players_cards]
+    hands = tuple(
+        get_mask(
+            card_index for card_index, is_played in zip(
+                card_indexes, game.players_played_cards_indexes[p_id])
+            if not is_played)
+        for p_id, card_indexes in enumerate(players_card_indexes))
+    memo = {}
+
+    def solve(hands: tuple, fold: tuple, first_player: int, won: tuple):
+        key = (hands, fold, first_player, won)
+        outcome = memo.get(key)
+        if outcome is not None:
+            return outcome
+        if deadline is not None and perf_counter() > deadline:
+            raise DeadlineReached()
+        if len(fold) == nb_players:
+            winner = (
+                first_player + get_index_winner_card_index(fold)
+                ) % nb_players
+            won = won[:winner] + (won[winner] + 1,) + won[winner + 1:]
+            if any(hands):
+                outcome = solve(hands, (), winner, won)
+            else:
+                outcome = won
+        else:
+            p_id = (first_player + len(fold)) % nb_players
+            legal_mask = get_legal_moves_mask(
+                hands[p_id], 0, get_fold_color(fold))
+            best_score = None
+            tried_cards = set()
+            for card_index in get_card_indexes_from_mask(legal_mask):
+                # copies of a duplicated card are the same move
+                card = Deck.card2index[Deck.cards_list[card_index]]
+                if card in tried_cards:
+                    continue
+                tried_cards.add(card)
+                child_outcome = solve(
+                    hands[:p_id] + (hands[p_id] & ~(1 << card_index),)
+                    + hands[p_id + 1:],
+                    fold + (card,), first_player, won)
+                score = get_score(game, bids[p_id], child_outcome[p_id])
+                if best_score is None or score > best_score:
+                    best_score = score
+                    outcome = child_outcome
+        memo[key] = outcome
+        return outcome
+
+    fold = tuple(Deck.card2index[card] for card in game.fold_cards)
+    won = tuple(game.players_won_folds)
+    outcomes = []
+    try:
+        for move in legal_moves:
+            card_index = players_card_indexes[player_id][move]
+            outcomes.append(solve(
+                hands[:player_id] + (hands[player_id] & ~(1 << card_index),)
+                + hands[player_id + 1:],
+                fold + (
+                    Deck.card2index[game.players_cards[player_id][move]],),
+                game.first_player, won))
+    except DeadlineReached:
+        return None
+    return outcomes
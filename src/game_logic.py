@@ -1,18 +1,38 @@
 
 import random
 import logging
-from copy import deepcopy
+import multiprocessing
 from typing import List
+from statistics import pvariance
+from math import ceil, log, log2, sqrt
+from time import perf_counter
 
 from GameConfig import GameConfig
 from Game import Game
-from Node import Node
+from GameState import GameState
+import instrumentation
 from Deck import Deck
+from ValueTable import ValueTable
 from game_utils import (
     play_card, set_card_as_observed_by_player, get_score,
-    replace_hands_of_other_players_depending_of_player_pov,
-    get_index_winner_card,
-    get_legal_moves)
+    get_determinizations, set_determinization,
+    get_index_winner_card_index)
+from bitmask_utils import set_player_masks, get_legal_moves
+from zobrist import (
+    init_round_hashes, hash_bid, hash_fold_won, get_info_hash,
+    get_move_hash, HASH_MASK)
+from endgame_solver import get_nb_cards_left, get_moves_outcomes
+from batch_playouts import (
+    get_batch_playout_scores, get_batch_scores, play_batch_round, get_rng)
+
+
+# Created by get_decision_pool
+decision_pool = None
+# Playouts per move between two deadline checks of a time-budgeted search
+ANYTIME_BATCH_SIZE = {'python': 1, 'numpy': 64}
+# Part of the time budget of a decision the endgame solver can use, the
+# rest is left to the playouts if it runs out of time (see endgame)
+ENDGAME_TIME_RATIO = 0.5
 
 
 def play_game(game: Game):
@@ -28,20 +48,34 @@ def init_round(game: Game):
     if not game.mode_playout:
         logging.debug(
             f'Init round {game.game_round} (deal cards)')
-    # shuffle the deck
-    deck = Deck()
     # gives each player a number of cards equal to the game round number
-    game.players_cards = [
-            deck.cards_to_draw[
-                player_id * game.game_round:
-                player_id * game.game_round + game.game_round
-            ] for player_id in range(game.nb_players)]
+    if game.deck_service is None:
+        # shuffle the deck
+        deck = Deck()
+        game.players_cards = [
+                deck.cards_to_draw[
+                    player_id * game.game_round:
+                    player_id * game.game_round + game.game_round
+                ] for player_id in range(game.nb_players)]
+    else:
+        # the engine plays with cards, not indexes: the hands dealt as
+        # indexes are turned into cards here
+        game.players_cards = [
+            [Deck.cards_list[i] for i in hand]
+            for hand in game.deck_service.deal(
+                game.nb_players, game.game_round).tolist()]
     game.players_played_cards_indexes = [
         [False for _ in range(game.game_round)]
         for _ in range(game.nb_players)]
+    game.players_card_indexes = [None] * game.nb_players
+    game.players_hand_masks = [0] * game.nb_players
+    game.players_played_masks = [0] * game.nb_players
+    for player_id in range(game.nb_players):
+        set_player_masks(game, player_id)
     game.players_observed_cards_in_round = [
-        [0] * len(deck.cards_to_draw)
+        [0] * Deck.number_of_cards
         for _ in range(game.nb_players)]
+    game.players_void_colors = [() for _ in range(game.nb_players)]
     game.players_pred_folds = [0 for _ in range(game.nb_players)]
     game.players_won_folds = [0] * game.nb_players
     game.chckpt_bid = 0
@@ -53,6 +87,7 @@ def init_round(game: Game):
         for card in game.players_cards[player_id]:
             card_index = Deck.card2index[card]
             set_card_as_observed_by_player(game, card_index, player_id)
+    init_round_hashes(game)
 
     if not game.mode_playout:
         for player_id in range(game.nb_players):
@@ -65,33 +100,62 @@ def play_round(game: Game):
 
     # The first player to play at the beginning of the round
     # changes at each round
-    game.first_player = game.first_round_player % (game.nb_players)
+    # (not when resuming a round already in its card phase)
+    if game.chckpt_fold == 0 and game.chckpt_player_turn == 0:
+        game.first_player = game.first_round_player % (game.nb_players)
     if not game.mode_playout:
         logging.debug(f'Start round {game.game_round}')
+    # decisions made in the game (not in a playout) are timed
+    is_instrumented = instrumentation.enabled and not game.mode_playout
+    if instrumentation.enabled and game.mode_playout:
+        instrumentation.incr('playouts')
     # Phase 1: Bid
     for player_id in range(game.chckpt_bid, game.nb_players):
         game.chckpt_bid = player_id + 1
+        if is_instrumented:
+            start_time = perf_counter()
         game.players_pred_folds[player_id] = action_bid(game, player_id)
+        if is_instrumented:
+            instrumentation.add_decision_time(
+                game, player_id, 'bid', start_time)
+        hash_bid(game, player_id, game.players_pred_folds[player_id])
         if not game.mode_playout:
+            if game.decision_recorder is not None:
+                game.decision_recorder(
+                    game, player_id, 'bid',
+                    game.players_pred_folds[player_id])
             logging.debug(
                 f'Prediction player {player_id}:'
                 f' {game.players_pred_folds[player_id]}')
 
     # Phase 2: Play cards and save score
+    # 'chckpt_fold' is the fold in progress, so that a round resumed in
+    # the middle of a fold finishes this fold first.
     for i_fold in range(game.chckpt_fold, game.game_round):
-        game.chckpt_fold = i_fold + 1
+        game.chckpt_fold = i_fold
         if not game.mode_playout:
             logging.debug(
                 f'Fold {i_fold + 1}: '
                 f'First player: {game.first_player}')
-        game.chosen_color = None
+        if game.chckpt_player_turn == 0:
+            game.chosen_color = None
         for i_turn in range(game.chckpt_player_turn, game.nb_players):
             game.chckpt_player_turn = i_turn + 1
             turn = (game.first_player + i_turn) % (game.nb_players)
             legal_moves = get_legal_moves(game, turn)
 
             # ACTION
+            is_instrumented = instrumentation.enabled \
+                and not game.mode_playout
+            if is_instrumented:
+                start_time = perf_counter()
             action = action_choose_card(game, turn, legal_moves)
+            if is_instrumented:
+                instrumentation.add_decision_time(
+                    game, turn, 'play_card', start_time)
+            if not game.mode_playout:
+                if game.decision_recorder is not None:
+                    game.decision_recorder(game, turn, 'play_card', action)
             play_card(game, turn, action)
 
         game.chckpt_player_turn = 0
@@ -100,17 +164,22 @@ def play_round(game: Game):
         if not game.mode_playout:
             logging.debug(
                 f'Played cards: {game.fold_cards}')
+        if instrumentation.enabled:
+            instrumentation.incr('fold_resolutions')
+        index_winner_card = get_index_winner_card_index([
+            Deck.card2index[card] for card in game.fold_cards])
         player_who_won = (
-            game.first_player +
-            get_index_winner_card(game.fold_cards)) % (game.nb_players)
+            game.first_player + index_winner_card) % (game.nb_players)
         # set the winner as the first player for next fold
         game.first_player = player_who_won
+        hash_fold_won(game, player_who_won)
         # empty the fold after getting winner
         game.fold_cards = []
         if not game.mode_playout:
             logging.debug(
                 f'Fold winner: {player_who_won}')
         game.players_won_folds[player_who_won] += 1
+        game.chckpt_fold = i_fold + 1
 
     # Calculate the score for each player and save
     game.players_scores = [game.players_scores[player_id] + get_score(
@@ -140,6 +209,12 @@ def action_bid(game: Game, player_id: int):
             if bid_choice.isnumeric():
                 if int(bid_choice) in range(game.game_round + 1):
                     return int(bid_choice)
+    elif game.mode_playout and game.playout_policy is not None:
+        return game.playout_policy(
+            game, player_id, range(game.game_round + 1), 'bid')
+    elif game.mode_playout and GameConfig.value_table_playout_bids:
+        return ValueTable.get(GameConfig.value_table_path).get_best_bid(
+            game, player_id)
     elif game.player_id2type_player[player_id] == 'random' \
             or game.mode_playout:
         return random.randint(
@@ -170,6 +245,8 @@ def action_choose_card(game: Game, player_id: int, legal_moves: List[int]):
             not game.mode_playout:
         return mcts(game=game, player_id=player_id,
                     legal_moves=legal_moves, phase='play_card')
+    elif game.mode_playout and game.playout_policy is not None:
+        return game.playout_policy(game, player_id, legal_moves, 'play_card')
     elif game.player_id2type_player[player_id] == 'random' \
             or game.mode_playout:
         return random.choice(legal_moves)
@@ -181,129 +258,649 @@ def action_choose_card(game: Game, player_id: int, legal_moves: List[int]):
 
 
 def mcts(game: Game, player_id: int, legal_moves=None, phase=None):
-    if GameConfig.mcts_type == 'flatmc':
+    mcts_type = game.player_id2mcts_type.get(
+        player_id, GameConfig.mcts_type)
+    if mcts_type == 'flatmc':
         return flatmc(game, player_id, legal_moves, phase)
-    elif GameConfig.mcts_type == 'puremcts':
+    elif mcts_type == 'puremcts':
         return puremcts(game, player_id, legal_moves, phase)
+    elif mcts_type == 'parallel_ismcts':
+        from parallel_ismcts import parallel_ismcts
+        return parallel_ismcts(game, player_id, legal_moves, phase)
     else:
         raise ValueError(
             'config error: mcts_type must has value in: '
-            '["flatmc", "puremcts"]')
+            '["flatmc", "puremcts", "parallel_ismcts"]')
 
 
 def flatmc(game: Game, player_id: int, legal_moves=None, phase=None):
     '''
     Monte Carlo algoritmh for next move to play prediction.
     The algorithm gives each legal move the same credit of iterations.
-    It creates a copy of the game to simulate the following:
+    It snapshots the game state to simulate the following:
     It plays a legal move and choose randomly (playouts) each next play
     until the end of the game (terminal state) and save the result of the game.
     Once each legal move has been tried, it selects the move which gives back
     the most victories.
+    Playouts are run one by one by play_round (GameConfig.flatmc_backend =
+    'python') or all at once by batch_playouts ('numpy').
+    In the 'play_card' phase, GameConfig.player_id2allocation can instead
+    share the iterations between moves with a bandit strategy
+    (see get_adaptive_moves_stats).
+    The search stops after player_id2nb_of_iterations playouts or at the
+    end of player_id2time_budget_ms, and keeps the best move found so far.
+    With GameConfig.endgame_max_cards_left, once few cards are left in the
+    round, the cards are chosen by the exact solver instead (see endgame),
+    unless it runs out of time.
     '''
     if phase == 'bid':
         legal_moves = range(game.game_round + 1)
+    start_time = perf_counter()
+    if is_endgame(game, phase):
+        move = endgame(game, player_id, legal_moves, start_time)
+        if move is not None:
+            return move
+    deadline = get_deadline(game, player_id, start_time)
+    # None: no limit other than the time budget
+    nb_iterations = game.player_id2nb_of_iterations.get(player_id)
+    nb_playouts = None
+    if nb_iterations is not None:
+        # at least one playout per move, even with fewer iterations
+        nb_playouts = max(1, nb_iterations // len(legal_moves))
+    elif deadline is None:
+        raise ValueError(
+            f'config error: player {player_id} needs a number of iterations'
+            ' or a time budget.')
+    allocation = game.player_id2allocation.get(player_id, 'uniform')
+    game.search_info = {
+        'player_id': player_id, 'phase': phase, 'moves': list(legal_moves)}
+    if phase == 'play_card' and allocation != 'uniform':
+        best_index, moves_visits = get_adaptive_moves_stats(
+            game, player_id, legal_moves, phase, nb_iterations, allocation,
+            deadline)
+        set_search_time(game, start_time, sum(moves_visits), moves_visits)
+        return legal_moves[best_index]
+
+    if phase == 'play_card' and GameConfig.flatmc_common_random_numbers:
+        moves_scores, nb_playouts = get_anytime_chunks_results(
+            get_paired_moves_scores, game, player_id, legal_moves, phase,
+            nb_playouts, deadline)
+        moves_scores = [row for chunk in moves_scores for row in chunk]
+        moves_sum_scores = [sum(x) for x in zip(*moves_scores)] or [
+            0 for _ in legal_moves]
+        game.search_info['variance_reduction'] = get_variance_reduction(
+            moves_scores)
+        logging.debug(
+            f'flatmc player {player_id}: estimated variance reduction '
+            f'of paired playouts: {game.search_info["variance_reduction"]}')
+    else:
+        chunks_sum_scores, nb_playouts = get_anytime_chunks_results(
+            get_moves_sum_scores, game, player_id, legal_moves, phase,
+            nb_playouts, deadline)
+        moves_sum_scores = [sum(x) for x in zip(*chunks_sum_scores)]
+    # bids share their playouts
+    set_search_time(
+        game, start_time,
+        nb_playouts if phase == 'bid' else nb_playouts * len(legal_moves),
+        [nb_playouts for _ in legal_moves])
     best_sum_scores = - 1e6
-    for move in legal_moves:
-        sum_scores = 0
-        for _ in range(game.player_id2nb_of_iterations[player_id]
-                       // len(legal_moves)):
-            chckpt_game = deepcopy(game)
-            # Defines if mcts plays with hidden information or not
-            if not game.player_id2is_cheater[player_id]:
-                replace_hands_of_other_players_depending_of_player_pov(
-                    chckpt_game, player_id)
-            chckpt_game.mode_playout = True
-            if phase == 'bid':
-                chckpt_game.players_pred_folds[player_id] = move
-            elif phase == 'play_card':
-                play_card(chckpt_game, player_id=player_id, action=move)
-            else:
-                raise ValueError(
-                    f"'phase: {phase}'"
-                    "Parameter 'phase must have been set to 'bid' or"
-                    "'play_card'.")
-            play_round(chckpt_game)
-            sum_scores += chckpt_game.players_scores[player_id]
+    for move, sum_scores in zip(legal_moves, moves_sum_scores):
         if sum_scores > best_sum_scores:
             best_sum_scores = sum_scores
             best_move = move
     return best_move
 
 
-def puremcts(game: Game, player_id: int, legal_moves=None, phase=None):
+def is_endgame(game: Game, phase: str):
+    '''
+    True if the cards are chosen by the endgame solver (see endgame).
+    '''
+    return phase == 'play_card' \
+        and GameConfig.endgame_max_cards_left is not None \
+        and get_nb_cards_left(game) <= GameConfig.endgame_max_cards_left
 
-    # in bid phase, set legal_moves
+
+def endgame(game: Game, player_id: int, legal_moves, start_time: float):
+    '''
+    Card chosen with endgame_solver: the exact outcome of the round for
+    each move on the real hands for a cheater, the mean score of the
+    exact outcomes of GameConfig.endgame_nb_determinizations
+    determinizations otherwise.
+    With a time budget, the solver stops at ENDGAME_TIME_RATIO of it: the
+    card is then chosen with the determinizations solved so far, and None
+    is returned if none was solved (the caller falls back to playouts for
+    the rest of the budget).
+    '''
+    game.search_info = {
+        'player_id': player_id, 'phase': 'play_card',
+        'moves': list(legal_moves), 'endgame': True}
+    deadline = get_deadline(game, player_id, start_time)
+    if deadline is not None:
+        deadline = start_time + (deadline - start_time) * ENDGAME_TIME_RATIO
+    if game.player_id2is_cheater[player_id]:
+        determinizations = [None]
+    else:
+        determinizations = get_determinizations(
+            game, player_id, GameConfig.endgame_nb_determinizations)
+    chckpt_state = game.snapshot()
+    moves_sum_scores = [0 for _ in legal_moves]
+    nb_solved = 0
+    for determinization in determinizations:
+        game.restore(chckpt_state)
+        if determinization is not None:
+            set_determinization(game, determinization)
+        outcomes = get_moves_outcomes(game, player_id, legal_moves, deadline)
+        if outcomes is None:
+            break
+        for i, outcome in enumerate(outcomes):
+            moves_sum_scores[i] += get_score(
+                game, game.players_pred_folds[player_id], outcome[player_id])
+        nb_solved += 1
+    game.restore(chckpt_state)
+    if nb_solved == 0:
+        logging.debug(
+            f'endgame player {player_id}: no determinization solved in '
+            'time, playouts instead')
+        return None
+    set_search_time(
+        game, start_time, nb_solved, [nb_solved for _ in legal_moves])
+    best_index = max(
+        range(len(legal_moves)), key=lambda i: moves_sum_scores[i])
+    return legal_moves[best_index]
+
+
+def get_deadline(game: Game, player_id: int, start_time: float):
+    '''
+    perf_counter() value at which the search of 'player_id' must stop
+    (None if the player has no time budget).
+    '''
+    time_budget_ms = game.player_id2time_budget_ms.get(player_id)
+    if time_budget_ms is None:
+        return None
+    return start_time + time_budget_ms / 1000
+
+
+def set_search_time(
+        game: Game, start_time: float, nb_iterations: int,
+        moves_visits: list):
+    game.search_info['nb_iterations'] = nb_iterations
+    game.search_info['move_visits'] = moves_visits
+    game.search_info['time_ms'] = (perf_counter() - start_time) * 1000
+    logging.debug(
+        f'Search player {game.search_info["player_id"]}: '
+        f'{nb_iterations} iterations in '
+        f'{game.search_info["time_ms"]:.1f} ms')
+
+
+def get_adaptive_moves_stats(
+        game: Game, player_id: int, legal_moves, phase, nb_iterations,
+        allocation: str, deadline=None):
+    '''
+    Share 'nb_iterations' playouts (None: no limit) between the legal moves,
+    until 'deadline' if any, with:
+    - 'ucb1': each playout goes to the move maximizing
+    mean + sqrt(2 ln(t) / n), with scores normalized to [0, 1] with the
+    range of get_score for the round. The numpy backend samples the chosen
+    move by batches.
+    - 'successive_halving': up to ceil(log2(nb moves)) rounds; after each
+    round only the best half of the moves is kept. Each round shares the
+    budget left (and the time) equally with the rounds left, so playouts
+    not run by a round go to the next ones, and plays every survivor at
+    least once (the first round plays every move, even with fewer
+    iterations than moves). The halving stops when the budget left cannot
+    play every survivor once.
+    Return the index of the best move (the most visited one for 'ucb1',
+    the best survivor for 'successive_halving') and the number of playouts
+    of each move.
+    '''
+    nb_moves = len(legal_moves)
+    moves_sum_scores = [0 for _ in legal_moves]
+    moves_visits = [0 for _ in legal_moves]
+    if allocation == 'successive_halving':
+        nb_rounds = max(1, ceil(log2(nb_moves)))
+        survivors = list(range(nb_moves))
+        start_time = perf_counter()
+        for i_round in range(nb_rounds):
+            nb_playouts = None
+            if nb_iterations is not None:
+                # the budget left is shared by the rounds left: a round
+                # that cannot play every survivor once ends the halving
+                nb_budget_left = nb_iterations - sum(moves_visits)
+                if i_round > 0 and nb_budget_left < len(survivors):
+                    break
+                nb_playouts = max(1, nb_budget_left // (
+                    (nb_rounds - i_round) * len(survivors)))
+            round_deadline = None
+            if deadline is not None:
+                round_deadline = start_time + (
+                    deadline - start_time) * (i_round + 1) / nb_rounds
+            chunks_sum_scores, nb_playouts = get_anytime_chunks_results(
+                get_moves_sum_scores, game, player_id,
+                [legal_moves[i] for i in survivors], phase, nb_playouts,
+                round_deadline)
+            for i, sum_scores in zip(
+                    survivors, map(sum, zip(*chunks_sum_scores))):
+                moves_sum_scores[i] += sum_scores
+                moves_visits[i] += nb_playouts
+            survivors.sort(
+                key=lambda i: moves_sum_scores[i] / moves_visits[i],
+                reverse=True)
+            survivors = survivors[:ceil(len(survivors) / 2)]
+        return survivors[0], moves_visits
+    elif allocation != 'ucb1':
+        raise ValueError(
+            f'config error: allocation of player {player_id} must has value '
+            'in: ["uniform", "ucb1", "successive_halving"]')
+
+    backend = GameConfig.flatmc_backend
+    batch_size = ANYTIME_BATCH_SIZE[backend]
+    if backend == 'numpy' and nb_iterations is not None:
+        batch_size = max(1, nb_iterations // (10 * nb_moves))
+    previous_score = game.players_scores[player_id]
+    score_range = 30 * game.game_round
+    chckpt_state = game.snapshot()
+    while (nb_iterations is None or sum(moves_visits) < nb_iterations) and (
+            deadline is None or perf_counter() < deadline
+            or sum(moves_visits) == 0):
+        t = sum(moves_visits)
+        if 0 in moves_visits:
+            i = moves_visits.index(0)
+        else:
+            i = max(range(nb_moves), key=lambda i: (
+                (moves_sum_scores[i] / moves_visits[i] - previous_score
+                 + 10 * game.game_round) / score_range
+                + sqrt(2 * log(t) / moves_visits[i])))
+        nb_playouts = batch_size
+        if nb_iterations is not None:
+            nb_playouts = min(batch_size, nb_iterations - t)
+        moves_sum_scores[i] += get_moves_sum_scores(
+            game, player_id, [legal_moves[i]], phase, nb_playouts,
+            backend)[0]
+        moves_visits[i] += nb_playouts
+    game.restore(chckpt_state)
+    # the most visited move
+    return max(range(nb_moves), key=lambda i: (
+        moves_visits[i], moves_sum_scores[i] / max(moves_visits[i], 1))), \
+        moves_visits
+
+
+def get_moves_sum_scores(
+        game: Game, player_id: int, legal_moves, phase, nb_playouts: int,
+        backend: str):
+    '''
+    Return, for each legal move, the sum of the scores of 'player_id' over
+    'nb_playouts' playouts.
+    '''
     if phase == 'bid':
-        legal_moves = range(game.game_round + 1)
-    # Option 1, current node has chlid(ren), leaf not reached
-    if game.node_current.is_has_child_node():
-        # no constraint on bid choice
+        return get_bids_sum_scores(
+            game, player_id, legal_moves, nb_playouts, backend)
+    moves_sum_scores = []
+    # Playouts are run on the game itself, which is rewound to this
+    # checkpoint before each playout and once the search is over.
+    chckpt_state = game.snapshot()
+    for move in legal_moves:
+        if backend == 'numpy':
+            sum_scores = int(get_batch_playout_scores(
+                game, player_id, nb_playouts, move, phase).sum())
+        elif backend == 'python':
+            sum_scores = get_playouts_sum_scores(
+                game, chckpt_state, player_id, nb_playouts, move, phase)
+        else:
+            raise ValueError(
+                'config error: flatmc_backend must has value in: '
+                '["python", "numpy"]')
+        moves_sum_scores.append(sum_scores)
+    game.restore(chckpt_state)
+    return moves_sum_scores
+
+
+def get_bids_sum_scores(
+        game: Game, player_id: int, bids, nb_playouts: int, backend: str):
+    '''
+    Same as get_moves_sum_scores for the bid phase. In a playout, cards are
+    played whatever the bid of 'player_id' is: each playout is played once,
+    and its number of won folds is scored for every bid.
+    '''
+    previous_score = game.players_scores[player_id]
+    if GameConfig.value_table_flatmc_bids:
+        # playouts cut after the bids: the folds won come from the table
+        probabilities = ValueTable.get(
+            GameConfig.value_table_path).get_won_folds_probabilities(
+                game, player_id)
+        return [
+            nb_playouts * sum(
+                probability * (previous_score + get_score(
+                    game=game, predicted_wins=bid, actual_wins=won_folds))
+                for won_folds, probability in enumerate(probabilities))
+            for bid in bids]
+    if backend == 'numpy':
+        _, won_folds = play_batch_round(
+            game, player_id, nb_playouts, bids[0], 'bid')
+        return [
+            int((previous_score + get_batch_scores(
+                game, bid, won_folds[:, player_id])).sum())
+            for bid in bids]
+    elif backend != 'python':
+        raise ValueError(
+            'config error: flatmc_backend must has value in: '
+            '["python", "numpy"]')
+
+    # won_folds_counts[i]: number of playouts where 'player_id' won i folds
+    won_folds_counts = [0] * (game.game_round + 1)
+    chckpt_state = game.snapshot()
+    for determinization in get_playouts_determinizations(
+            game, player_id, nb_playouts):
+        game.restore(chckpt_state)
+        if determinization is not None:
+            set_determinization(game, determinization)
+        game.mode_playout = True
+        game.players_pred_folds[player_id] = bids[0]
+        play_round(game)
+        won_folds_counts[game.players_won_folds[player_id]] += 1
+    game.restore(chckpt_state)
+    return [
+        sum(count * (previous_score + get_score(
+            game=game, predicted_wins=bid, actual_wins=won_folds))
+            for won_folds, count in enumerate(won_folds_counts))
+        for bid in bids]
+
+
+def get_decision_pool():
+    '''
+    Pool of GameConfig.nb_decision_workers processes used by flatmc.
+    It is created at the first parallel decision and kept for the
+    following ones.
+    '''
+    global decision_pool
+    if decision_pool is None:
+        decision_pool = multiprocessing.Pool(
+            GameConfig.nb_decision_workers)
+    return decision_pool
+
+
+def close_decision_pool():
+    global decision_pool
+    if decision_pool is not None:
+        decision_pool.close()
+        decision_pool.join()
+        decision_pool = None
+    # and the pool of parallel_ismcts (imported here as in mcts)
+    from parallel_ismcts import close_tree_pool
+    close_tree_pool()
+
+
+def get_game_from_bytes(state, players_config: dict):
+    '''
+    Game of GameConfig with the players of 'players_config' (see
+    Game.get_players_config) in the state encoded by GameState.to_bytes.
+    '''
+    state = GameState.from_bytes(state)
+    args = {
+        k: v for k, v in vars(GameConfig).items() if not k.startswith('__')}
+    args.update(players_config)
+    args['nb_players'] = state.nb_players
+    game = Game(**args)
+    game.restore(state)
+    return game
+
+
+def run_seeded_chunk(args):
+    '''
+    Task run by a worker of the decision pool: (function, state bytes,
+    players config, *function args, is_instrumented, seed). The game is
+    sent as the bytes of its GameState rather than pickled. The random
+    generators of the worker are seeded by the task, so results do not
+    depend on which worker runs which task.
+    Return the result of the function and the instrumentation counters of
+    the task (None if the instrumentation is disabled).
+    '''
+    function, state, players_config, is_instrumented, seed = \
+        args[0], args[1], args[2], args[-2], args[-1]
+    game = get_game_from_bytes(state, players_config)
+    random.seed(seed)
+    instrumentation.enabled = is_instrumented
+    instrumentation.reset()
+    result = function(game, *args[3:-2])
+    return result, instrumentation.get_stats() if is_instrumented else None
+
+
+def get_chunks_results(
+        function, game: Game, player_id: int, legal_moves, phase,
+        nb_playouts: int):
+    '''
+    Run function(game, player_id, legal_moves, phase, nb_playouts, backend)
+    (get_moves_sum_scores or get_paired_moves_scores) and return the list
+    of its results.
+    With GameConfig.nb_decision_workers > 1, the playouts are split between
+    the workers of the decision pool (root parallelization), one result per
+    worker, and the instrumentation counters of the workers are added to
+    the ones of this process. Task seeds are drawn from the 'random'
+    module: a seeded game gives the same decisions for a given number of
+    workers.
+    '''
+    if GameConfig.nb_decision_workers <= 1:
+        return [function(
+            game, player_id, legal_moves, phase, nb_playouts,
+            GameConfig.flatmc_backend)]
+    nb_chunks = min(GameConfig.nb_decision_workers, max(nb_playouts, 1))
+    state = game.snapshot().to_bytes()
+    players_config = game.get_players_config()
+    tasks = [
+        (function, state, players_config, player_id, legal_moves, phase,
+         nb_playouts // nb_chunks + (i < nb_playouts % nb_chunks),
+         GameConfig.flatmc_backend, instrumentation.enabled,
+         random.getrandbits(32))
+        for i in range(nb_chunks)]
+    results = []
+    for result, stats in get_decision_pool().map(run_seeded_chunk, tasks):
+        if stats is not None:
+            instrumentation.merge(stats)
+        results.append(result)
+    return results
+
+
+def get_anytime_chunks_results(
+        function, game: Game, player_id: int, legal_moves, phase,
+        nb_playouts, deadline=None):
+    '''
+    Same as get_chunks_results with a time limit: playouts are run by
+    batches until 'deadline' (a perf_counter() value) or until
+    'nb_playouts' playouts per move (None: no limit, else at least 1). At
+    least one batch is run.
+    Return the results of all the batches and the number of playouts per
+    move actually run.
+    '''
+    if deadline is None:
+        return get_chunks_results(
+            function, game, player_id, legal_moves, phase, nb_playouts), \
+            nb_playouts
+    batch_size = ANYTIME_BATCH_SIZE[GameConfig.flatmc_backend] * max(
+        1, GameConfig.nb_decision_workers)
+    results = []
+    nb_playouts_done = 0
+    while (nb_playouts is None or nb_playouts_done < nb_playouts) and (
+            perf_counter() < deadline or nb_playouts_done == 0):
+        nb_batch_playouts = batch_size
+        if nb_playouts is not None:
+            nb_batch_playouts = min(
+                batch_size, nb_playouts - nb_playouts_done)
+        results += get_chunks_results(
+            function, game, player_id, legal_moves, phase,
+            nb_batch_playouts)
+        nb_playouts_done += nb_batch_playouts
+    return results, nb_playouts_done
+
+
+def get_paired_moves_scores(
+        game: Game, player_id: int, legal_moves, phase, nb_playouts: int,
+        backend: str):
+    '''
+    Common random numbers version of get_moves_sum_scores for the
+    'play_card' phase: each iteration draws one determinization and one
+    random stream, and every legal move is played against them, so that
+    moves are compared on the same worlds.
+    Return the scores of 'player_id' as one row per iteration and one
+    column per move.
+    '''
+    if backend == 'numpy':
+        # Same seed for every move: same determinizations, same draws
+        seed = random.getrandbits(64)
+        return [list(row) for row in zip(*[
+            get_batch_playout_scores(
+                game, player_id, nb_playouts, move, phase,
+                get_rng(seed)).tolist()
+            for move in legal_moves])]
+    elif backend != 'python':
+        raise ValueError(
+            'config error: flatmc_backend must has value in: '
+            '["python", "numpy"]')
+
+    moves_scores = []
+    chckpt_state = game.snapshot()
+    for determinization in get_playouts_determinizations(
+            game, player_id, nb_playouts):
+        game.restore(chckpt_state)
+        if determinization is not None:
+            set_determinization(game, determinization)
+        world_state = game.snapshot()
+        random_state = random.getstate()
+        row = []
+        for move in legal_moves:
+            game.restore(world_state)
+            random.setstate(random_state)
+            game.mode_playout = True
+            play_card(game, player_id=player_id, action=move)
+            play_round(game)
+            row.append(game.players_scores[player_id])
+        moves_scores.append(row)
+    game.restore(chckpt_state)
+    return moves_scores
+
+
+def get_variance_reduction(moves_scores: list):
+    '''
+    Estimate how much pairing the playouts reduces the variance of the
+    score difference between the best move and the other moves:
+    1 - sum(Var(X_m - X_best)) / sum(Var(X_m) + Var(X_best)).
+    Return None if it cannot be estimated.
+    '''
+    if len(moves_scores) < 2 or len(moves_scores[0]) < 2:
+        return None
+    columns = list(zip(*moves_scores))
+    best = max(columns, key=sum)
+    paired_variance = 0
+    independent_variance = 0
+    for column in columns:
+        if column is best:
+            continue
+        paired_variance += pvariance([x - y for x, y in zip(column, best)])
+        independent_variance += pvariance(column) + pvariance(best)
+    if independent_variance == 0:
+        return None
+    return 1 - paired_variance / independent_variance
+
+
+def get_playouts_determinizations(
+        game: Game, player_id: int, nb_playouts: int):
+    '''
+    Hands of the other players drawn in bulk for each playout of
+    'player_id' (None for a cheater: he plays on the real hands).
+    '''
+    # Defines if mcts plays with hidden information or not
+    if game.player_id2is_cheater[player_id]:
+        return [None] * nb_playouts
+    return get_determinizations(game, player_id, nb_playouts)
+
+
+def get_playouts_sum_scores(
+        game: Game, chckpt_state: GameState, player_id: int,
+        nb_playouts: int, move, phase):
+    '''
+    Play 'nb_playouts' random ends of the round from 'chckpt_state' once
+    'player_id' has played 'move', and return the sum of his scores.
+    '''
+    sum_scores = 0
+    game.restore(chckpt_state)
+    for determinization in get_playouts_determinizations(
+            game, player_id, nb_playouts):
+        game.restore(chckpt_state)
+        if determinization is not None:
+            set_determinization(game, determinization)
+        game.mode_playout = True
         if phase == 'bid':
-            chosen_move = random.choices(
-                population=legal_moves,
-                weights=[
-                    x.get_weight()
-                    for x in game.node_current.get_children()],
-                k=1
-            )
-            move = chosen_move[0]
-            game.node_current = game.node_current.get_children()[move]
-        # possible constraint on card choice
+            game.players_pred_folds[player_id] = move
         elif phase == 'play_card':
-            # we consider duplicate cards as same action to play,
-            # then we must must remove duplicate choices in legal_moves
-            legal_moves_without_duplicates = [
-                x for x in {
-                    game.players_cards[player_id][move]: move
-                    for move in legal_moves}.values()]
-            # restrict the choice of nodes to the legal_moves
-            playable_move = [
-                x for i, x in enumerate(game.players_cards[player_id])
-                if i in legal_moves_without_duplicates]
-
-            chosen_move = random.choices(
-                population=legal_moves_without_duplicates,
-                weights=[
-                    x.get_weight()
-                    for x in game.node_current.get_children()
-                    if x.get_move() in playable_move
-                    ],
-                k=1
-            )
-            move = chosen_move[0]
-            game.node_current = [
-                x for x in game.node_current.get_children()
-                if x.get_move() == game.players_cards[player_id][move]][0]
+            play_card(game, player_id=player_id, action=move)
         else:
-            raise ValueError('incorrect phase type')
+            raise ValueError(
+                f"'phase: {phase}'"
+                "Parameter 'phase must have been set to 'bid' or"
+                "'play_card'.")
+        play_round(game)
+        sum_scores += game.players_scores[player_id]
+    return sum_scores
+
+
+def puremcts(game: Game, player_id: int, legal_moves=None, phase=None):
 
-    # Option 2, new leaf nodes are created and one is chosen randomly
+    # in bid phase, set legal_moves
+    if phase == 'bid':
+        legal_moves = range(game.game_round + 1)
+    # puremcts goes down the tree by one node per decision (the tree is
+    # trained across games): a decision is a single iteration, whatever
+    # the time budget is.
+    game.search_info = {
+        'player_id': player_id, 'phase': phase, 'moves': list(legal_moves),
+        'nb_iterations': 1}
+    if phase == 'bid':
+        moves = list(legal_moves)
+    elif phase == 'play_card':
+        # we consider duplicate cards as same action to play,
+        # less states, faster convergence
+        moves = list(dict.fromkeys(
+            game.players_cards[player_id][i] for i in legal_moves))
+    else:
+        raise ValueError('incorrect phase type')
+    children = [game.node_current.get_child(m) for m in moves]
+    # with a transposition table, moves are weighted by the statistics of
+    # the information state they lead to (see TranspositionTable)
+    transposition_table = game.transposition_table
+    if transposition_table is not None:
+        info_hash = get_info_hash(game, player_id)
+        info_hashes = [
+            (info_hash + get_move_hash(game, player_id, m, phase))
+            & HASH_MASK for m in moves]
+
+    # Option 1, every legal move has a node, leaf not reached
+    if all(children):
+        if transposition_table is None:
+            weights = [x.get_weight() for x in children]
+        else:
+            weights = [
+                transposition_table.get_weight(h, x)
+                for h, x in zip(info_hashes, children)]
+        chosen_move = random.choices(
+            population=moves,
+            weights=weights,
+            k=1
+        )[0]
+        game.node_current = children[moves.index(chosen_move)]
+
+    # Option 2, a legal move tried for the first time gets a new leaf node
+    # (children are only created for legal moves, when they are tried)
     else:
         # all next moves will be randomly played until terminal
         game.mode_playout = True
-        chosen_move = random.choice(legal_moves)
-        move = chosen_move
-        if phase == 'play_card':
-            # from index in hand to tuple card
-            chosen_move = game.players_cards[player_id][chosen_move]
+        chosen_move = random.choice(
+            [m for m, x in zip(moves, children) if x is None])
+        game.node_current = game.node_current.create_child(chosen_move)
+    if transposition_table is not None:
+        game.transposition_path.append(
+            info_hashes[moves.index(chosen_move)])
 
-        if phase == 'bid':
-            all_moves = range(game.game_round + 1)
-        elif phase == 'play_card':
-            # remove duplicates, 2 same cards are the same action
-            # less states, faster convergence
-            all_moves = list(set(Deck.cards_list))
-        else:
-            raise ValueError('incorrect phase type')
-
-        for m in all_moves:
-            child_node = Node(
-                parent=game.node_current,
-                move=m
-                )
-            if chosen_move == m:
-                next_node = child_node
-            game.node_current.add_child(child_node)
-        game.node_current = next_node
-    return move
+    if phase == 'bid':
+        return chosen_move
+    # from tuple card to index in hand
+    return [
+        i for i in legal_moves
+        if game.players_cards[player_id][i] == chosen_move][0]
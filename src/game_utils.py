@@ -1,13 +1,30 @@
 import random
+from collections import Counter
 
 from Game import Game
 from Deck import Deck
+from zobrist import hash_card
+from bitmask_utils import set_player_masks
+import instrumentation
+
+
+# Colors a player must follow if he can (see get_legal_moves)
+COLORS_TO_FOLLOW = ('red', 'blue', 'yellow')
+DECK_CARDS_COUNTS = Counter(Deck.cards_list)
 
 
 def play_card(game: Game, player_id, action: int):
 
     game.players_played_cards_indexes[player_id][action] = True
+    game.players_played_masks[player_id] |= \
+        1 << game.players_card_indexes[player_id][action]
     chosen_card = game.players_cards[player_id][action]
+    # a player who does not follow the color of the fold with a numbered
+    # card has no card of this color left (see get_determinizations)
+    if game.chosen_color in COLORS_TO_FOLLOW \
+            and chosen_card[1] not in (game.chosen_color, None) \
+            and game.chosen_color not in game.players_void_colors[player_id]:
+        game.players_void_colors[player_id] += (game.chosen_color,)
     # when a card is played, all players observe it as played
     card_index = Deck.card2index[chosen_card]
     for player_id in range(game.nb_players):
@@ -16,6 +33,7 @@ def play_card(game: Game, player_id, action: int):
             card_index=card_index,
             player_id=player_id
         )
+    hash_card(game, card_index)
     game.fold_cards = [x for x in game.fold_cards]
     game.fold_cards.append(chosen_card)
 
@@ -142,6 +160,68 @@ def get_index_winner_card(fold_cards: list):
         return winning_index
 
 
+# Tables used to resolve folds given as indexes of Deck.cards_list
+ESCAPE, NUMBER, PIRATE, MERMAID, SKULL_KING = range(5)
+CARD_KIND = tuple(
+    NUMBER if str(card[0]).isnumeric() else
+    {'escape': ESCAPE, 'pirate': PIRATE, 'mermaid': MERMAID,
+     'skull_king': SKULL_KING}[card[0]]
+    for card in Deck.cards_list)
+CARD_VALUE = tuple(
+    card[0] if kind == NUMBER else 0
+    for card, kind in zip(Deck.cards_list, CARD_KIND))
+CARD_COLOR = tuple(card[1] for card in Deck.cards_list)
+# SPECIAL_BEATS[winning_kind][kind] is True if a special card of 'kind'
+# takes the fold from 'winning_kind' (ESCAPE stands for no special card
+# played yet): skull king beats pirate, mermaid beats skull king and pirate
+# beats mermaid. Cards of the same kind do not beat each other.
+SPECIAL_BEATS = tuple(
+    tuple(
+        kind >= PIRATE and (
+            winning_kind == ESCAPE or
+            (winning_kind, kind) in [
+                (PIRATE, SKULL_KING), (SKULL_KING, MERMAID),
+                (MERMAID, PIRATE)])
+        for kind in range(5))
+    for winning_kind in range(5))
+
+
+def get_index_winner_card_index(fold_card_indexes):
+    '''
+    Same as get_index_winner_card, for a fold given as indexes of
+    Deck.cards_list. The fold is resolved in a single pass over the cards.
+    '''
+    assert len(fold_card_indexes) > 1
+    winning_kind = ESCAPE
+    winning_index = 0
+    # Best numbered card, used only if no special card is played
+    best_index = 0
+    best_black_value = -1
+    best_value = -1
+    chosen_color = None
+    for i, card_index in enumerate(fold_card_indexes):
+        kind = CARD_KIND[card_index]
+        if kind == NUMBER:
+            color = CARD_COLOR[card_index]
+            value = CARD_VALUE[card_index]
+            if chosen_color is None:
+                chosen_color = color
+            if color == 'black':
+                if value > best_black_value:
+                    best_black_value = value
+                    best_index = i
+            elif (color == chosen_color and best_black_value < 0
+                    and value >= best_value):
+                best_value = value
+                best_index = i
+        elif SPECIAL_BEATS[winning_kind][kind]:
+            winning_kind = kind
+            winning_index = i
+    if winning_kind == ESCAPE:
+        return best_index
+    return winning_index
+
+
 def get_randomly_generated_player_hand(game: Game, player_id: int):
     '''
     Skull King is a Hidden information game, this function allows
@@ -159,12 +239,103 @@ def get_randomly_generated_player_hand(game: Game, player_id: int):
         if not x]
     selected_indexes = random.sample(
         possible_remaining_card_indexes, game.game_round)
-    return [Deck().cards_list[i] for i in selected_indexes]
+    return [Deck.cards_list[i] for i in selected_indexes]
+
+
+def get_unseen_cards(game: Game, player_id: int):
+    '''
+    Cards that may be in the hands of the other players from the point of
+    view of 'player_id': the deck minus his hand minus the cards played in
+    the round (copies of a duplicated card are counted).
+    '''
+    counts = dict(DECK_CARDS_COUNTS)
+    for card in game.players_cards[player_id]:
+        counts[card] -= 1
+    for p_id in range(game.nb_players):
+        if p_id != player_id:
+            for card, is_played in zip(
+                    game.players_cards[p_id],
+                    game.players_played_cards_indexes[p_id]):
+                if is_played:
+                    counts[card] -= 1
+    return [card for card, count in counts.items() for _ in range(count)]
+
+
+def get_hidden_positions(game: Game, player_id: int):
+    '''
+    [(p_id, indexes of the cards p_id has not played yet), ...] for the
+    other players, the players with the most void colors first.
+    '''
+    return sorted(
+        [(p_id, [
+            i for i, is_played in enumerate(
+                game.players_played_cards_indexes[p_id])
+            if not is_played])
+         for p_id in range(game.nb_players) if p_id != player_id],
+        key=lambda x: -len(game.players_void_colors[x[0]]))
+
+
+def get_determinizations(
+        game: Game, player_id: int, nb_determinizations=1):
+    '''
+    Possible cards not played yet by the other players, as seen by
+    'player_id': [{p_id: cards}, ...], one dict per determinization.
+    The hands of a determinization are disjoint and drawn from
+    get_unseen_cards. A player is not dealt cards of a color he did not
+    follow (players_void_colors), unless there are not enough other cards
+    left for him.
+    The unseen cards are computed once for all the determinizations.
+    '''
+    if instrumentation.enabled:
+        instrumentation.incr('determinizations', nb_determinizations)
+    unseen_cards = get_unseen_cards(game, player_id)
+    hidden_positions = get_hidden_positions(game, player_id)
+    # indexes in unseen_cards of the cards each player may have, then of
+    # the ones of his void colors
+    players_allowed = {
+        p_id: ([i for i, x in enumerate(unseen_cards)
+                if x[1] not in game.players_void_colors[p_id]],
+               [i for i, x in enumerate(unseen_cards)
+                if x[1] in game.players_void_colors[p_id]])
+        for p_id, _ in hidden_positions}
+    determinizations = []
+    for _ in range(nb_determinizations):
+        dealt = set()
+        hands = {}
+        for p_id, positions in hidden_positions:
+            allowed, void = players_allowed[p_id]
+            if dealt:
+                allowed = [i for i in allowed if i not in dealt]
+            if len(allowed) < len(positions):
+                void = [i for i in void if i not in dealt]
+                draws = allowed + random.sample(
+                    void, len(positions) - len(allowed))
+                random.shuffle(draws)
+            else:
+                draws = random.sample(allowed, len(positions))
+            dealt.update(draws)
+            hands[p_id] = [unseen_cards[i] for i in draws]
+        determinizations.append(hands)
+    return determinizations
+
+
+def set_determinization(game: Game, hands: dict):
+    '''
+    Replace the cards not played yet by the players of 'hands' (see
+    get_determinizations).
+    '''
+    for p_id, cards in hands.items():
+        players_cards = list(game.players_cards[p_id])
+        positions = [
+            i for i, is_played in enumerate(
+                game.players_played_cards_indexes[p_id])
+            if not is_played]
+        for i, card in zip(positions, cards):
+            players_cards[i] = card
+        game.players_cards[p_id] = players_cards
+        set_player_masks(game, p_id)
 
 
 def replace_hands_of_other_players_depending_of_player_pov(
         game: Game, player_id: int):
-    for p_id in range(game.nb_players):
-        if player_id != p_id:
-            game.players_cards[p_id] = get_randomly_generated_player_hand(
-                game, player_id)
+    set_determinization(game, get_determinizations(game, player_id)[0])
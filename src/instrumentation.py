@@ -0,0 +1,64 @@
+'''
+Opt-in counters and timers of a game (GameConfig.instrumentation).
+Call sites test 'instrumentation.enabled' before counting, so that a
+disabled instrumentation costs one attribute lookup:
+    if instrumentation.enabled:
+        instrumentation.incr('fold_resolutions')
+Counted in the current process, to which the workers of the decision
+pool and of parallel_ismcts return their counters (see
+game_logic.run_seeded_chunk and parallel_ismcts.run_tree_worker):
+    - playouts: ends of round played in mode_playout or by the numpy
+      backend,
+    - snapshots, restores: GameState copies of the game (they replace
+      deepcopy(game)),
+    - determinizations: hands drawn for the other players,
+    - fold_resolutions,
+    - decisions/<phase>/<player type>/round_<n> and the time spent on
+      them in time_s/<phase>/<player type>/round_<n>.
+main.main resets the counters before each game and writes them in a
+CSV next to the one of the games (see get_stats_csv_name).
+'''
+from pathlib import Path
+from time import perf_counter
+
+enabled = False
+counters = {}
+
+
+def reset():
+    counters.clear()
+
+
+def incr(name: str, value=1):
+    counters[name] = counters.get(name, 0) + value
+
+
+def merge(stats: dict):
+    '''
+    Add the counters 'stats' (see get_stats) of another process.
+    '''
+    for name, value in stats.items():
+        incr(name, value)
+
+
+def add_decision_time(game, player_id: int, phase: str, start_time: float):
+    '''
+    Count a decision of 'player_id' started at 'start_time'
+    (perf_counter).
+    '''
+    key = (f'{phase}/{game.player_id2type_player[player_id]}'
+           f'/round_{game.game_round}')
+    incr(f'decisions/{key}')
+    incr(f'time_s/{key}', perf_counter() - start_time)
+
+
+def get_stats():
+    return dict(counters)
+
+
+def get_stats_csv_name(csv_name: str):
+    '''
+    games.csv -> games_stats.csv, in the same directory.
+    '''
+    path = Path(csv_name)
+    return str(path.with_name(f'{path.stem}_stats{path.suffix}'))
@@ -1,46 +1,199 @@
 
+import random
 from tqdm import tqdm
 from numpy import argmax
 import logging
 import csv
+import multiprocessing
 from pathlib import Path
 
 from Node import Node
+from TreeStore import TreeStore
+from TranspositionTable import TranspositionTable
+from DeckService import DeckService
+import instrumentation
 from Game import Game
 from GameConfig import GameConfig
-from game_logic import play_game
+from game_logic import play_game, close_decision_pool
 
 
-def main(config: GameConfig):
+def play_seeded_game(
+        config: GameConfig, node_root: Node, seed: int,
+        transposition_table: TranspositionTable = None,
+        decision_recorder=None):
+    '''
+    Play a whole game with the random generators seeded by 'seed', so that
+    any game of a run can be played again from its seed.
+    The instrumentation counters are reset before the game.
+    (decision_recorder: see Game.decision_recorder)
+    '''
+    random.seed(seed)
+    instrumentation.enabled = config.instrumentation
+    instrumentation.reset()
+    game = Game(
+        node_root=node_root, transposition_table=transposition_table,
+        deck_service=DeckService(seed) if config.deck_streams else None,
+        decision_recorder=decision_recorder, **get_config_dict(config))
+    logging.info(f'Start game (seed {seed}) -------------------------------')
+    play_game(game)
+    logging.info('End game -------------------------------')
+    return game
 
-    players_victory_count = {k: 0 for k in range(config.nb_players)}
-    nb_games = config.nb_games
 
-    node_root = None
-    if config.mcts_type == 'puremcts':
-        node_root = Node(
-            parent=None)
+def get_seeds(config: GameConfig):
+    '''
+    Seed of each game of a run (the same ones for the same config.seed).
+    '''
+    if config.seed is not None:
+        random.seed(config.seed)
+    return [random.getrandbits(32) for _ in range(config.nb_games)]
 
-    for _ in tqdm(range(nb_games)):
-        game = Game(node_root=node_root, **vars(config))
-        logging.info('Start game -------------------------------')
-        play_game(game)
 
-        if game.node_root is not None:
-            node_root = game.node_root
-            while game.node_current != game.node_root:
-                game.node_current.incr_n_visits()
-                if argmax(game.players_scores) == 1:
-                    game.node_current.incr_won_games()
-                game.node_current = game.node_current.get_parent()
+def get_config_dict(config: GameConfig):
+    # class attributes only (picklable, unlike vars(GameConfig))
+    return {k: v for k, v in vars(config).items() if not k.startswith('__')}
 
-        logging.info('End game -------------------------------')
-        players_victory_count[argmax(game.players_scores)] += 1
 
-    # ratios = {k: v / nb_games for k, v in players_victory_count.items()}
-    # print(f"Victory ratios: {ratios}")
+def get_game_path(game: Game):
+    '''
+    Moves of the nodes followed by puremcts in the tree during the game,
+    from the root (excluded) to game.node_current.
+    '''
+    path = []
+    node = game.node_current
+    while node != game.node_root:
+        path.append(node.get_move())
+        node = node.get_parent()
+    return path[::-1]
 
-    # SAVE CONFIG AND RESULTS TO CSV
+
+def merge_game_path(node_root: Node, path: list, is_won: bool):
+    '''
+    Add to the tree of 'node_root' the nodes of a game played on a copy of
+    it (see get_game_path) and update the statistics along the path, as it
+    is done at the end of a game played on the tree itself.
+    Return the number of nodes created.
+    '''
+    nb_created = 0
+    node = node_root
+    for move in path:
+        child = node.get_child(move)
+        if child is None:
+            child = node.create_child(move)
+            nb_created += 1
+        node = child
+        node.incr_n_visits()
+        if is_won:
+            node.incr_won_games()
+    return nb_created
+
+
+def get_tree_size_limiter(config: GameConfig, node_root: Node):
+    '''
+    Return a function to call with the number of nodes added to the tree
+    (an upper bound is enough) after each game: it removes the least
+    visited subtrees when the tree has more than config.tree_max_nodes
+    nodes. The tree is only counted when the bound exceeds the limit.
+    '''
+    max_nodes = config.tree_max_nodes
+    nb_nodes = node_root.get_nb_nodes() if max_nodes is not None else 0
+
+    def limit_tree_size(nb_added: int):
+        nonlocal nb_nodes
+        if max_nodes is None:
+            return
+        nb_nodes += nb_added
+        if nb_nodes > max_nodes:
+            nb_nodes = node_root.get_nb_nodes()
+        if nb_nodes > max_nodes:
+            nb_nodes = node_root.evict_least_visited(
+                int(max_nodes * config.tree_eviction_ratio))
+            logging.info(f'Tree evicted down to {nb_nodes} nodes')
+    return limit_tree_size
+
+
+def init_game_worker(config_dict: dict):
+    for k, v in config_dict.items():
+        setattr(GameConfig, k, v)
+    # Workers of a pool cannot start a pool of their own
+    GameConfig.nb_decision_workers = 1
+
+
+def play_game_task(args):
+    '''
+    Task run by a worker of the game pool.
+    '''
+    seed, node_root, transposition_table = args
+    game = play_seeded_game(GameConfig, node_root, seed, transposition_table)
+    path = get_game_path(game) if node_root is not None else None
+    return (seed, game.players_scores, path, game.transposition_path,
+            instrumentation.get_stats())
+
+
+def play_games(
+        config: GameConfig, node_root: Node, seeds: list,
+        transposition_table: TranspositionTable = None):
+    '''
+    Play a game for each seed and yield (seed, players_scores, stats) as
+    games finish (stats: instrumentation counters of the game). The
+    puremcts tree of 'node_root' is updated after each game.
+    With config.nb_game_workers > 1 games are spread over a process pool.
+    Each worker plays on a copy of the tree: games are sent by waves of
+    nb_game_workers and the paths they followed are merged into the tree
+    between waves.
+    The tree is kept under config.tree_max_nodes nodes (see
+    get_tree_size_limiter). The statistics of 'transposition_table' are
+    updated as the ones of the nodes.
+    '''
+    if node_root is not None:
+        limit_tree_size = get_tree_size_limiter(config, node_root)
+    if config.nb_game_workers <= 1:
+        for seed in seeds:
+            game = play_seeded_game(
+                config, node_root, seed, transposition_table)
+            if transposition_table is not None:
+                for info_hash in game.transposition_path:
+                    transposition_table.update(
+                        info_hash, argmax(game.players_scores) == 1)
+            if game.node_root is not None:
+                while game.node_current != game.node_root:
+                    game.node_current.incr_n_visits()
+                    if argmax(game.players_scores) == 1:
+                        game.node_current.incr_won_games()
+                    game.node_current = game.node_current.get_parent()
+                # puremcts creates at most one node per game (the
+                # expansion starts the random playout)
+                limit_tree_size(1)
+            yield seed, game.players_scores, instrumentation.get_stats()
+        return
+
+    if node_root is None:
+        wave_size = len(seeds)
+    else:
+        wave_size = config.nb_game_workers
+    with multiprocessing.Pool(
+            config.nb_game_workers, initializer=init_game_worker,
+            initargs=(get_config_dict(config),)) as pool:
+        for i in range(0, len(seeds), wave_size):
+            tasks = [
+                (seed, node_root, transposition_table)
+                for seed in seeds[i:i + wave_size]]
+            for seed, players_scores, path, transposition_path, stats in \
+                    pool.imap_unordered(play_game_task, tasks):
+                if transposition_table is not None:
+                    for info_hash in transposition_path:
+                        transposition_table.update(
+                            info_hash, argmax(players_scores) == 1)
+                if path is not None:
+                    limit_tree_size(merge_game_path(
+                        node_root, path, argmax(players_scores) == 1))
+                yield seed, players_scores, stats
+
+
+def write_games_csv(config: GameConfig, players_victory_count: dict):
+    '''
+    Append the number of victories of each player to config.csv_name.
+    '''
     is_write_header = True
     csv_name = config.csv_name
     if Path(csv_name).is_file():
@@ -60,7 +213,7 @@ def main(config: GameConfig):
     if is_write_header:
         writer.writeheader()
     row = {}
-    for i in range(game.nb_players):
+    for i in range(config.nb_players):
         row['id_config'] = config.id_config
         row['player_id'] = i
         row['nb_victories'] = players_victory_count[i]
@@ -71,6 +224,79 @@ def main(config: GameConfig):
         writer.writerow(row)
 
 
+def write_stats_csv(config: GameConfig, games_stats: list):
+    '''
+    Append the instrumentation counters of each game, one row per counter,
+    to the stats CSV next to config.csv_name.
+    '''
+    csv_name = instrumentation.get_stats_csv_name(config.csv_name)
+    is_write_header = not Path(csv_name).is_file()
+    with open(csv_name, mode='a', newline='') as csvfile:
+        writer = csv.DictWriter(
+            csvfile, fieldnames=['id_config', 'seed', 'stat', 'value'])
+        if is_write_header:
+            writer.writeheader()
+        for seed, stats in games_stats:
+            for stat, value in sorted(stats.items()):
+                writer.writerow({
+                    'id_config': config.id_config, 'seed': seed,
+                    'stat': stat, 'value': value})
+
+
+def init_puremcts(config: GameConfig):
+    '''
+    Tree (and its TreeStore if config.tree_path is set) and transposition
+    table shared by the games of a run, all None if puremcts is not used.
+    '''
+    node_root = None
+    tree_store = None
+    transposition_table = None
+    if config.mcts_type == 'puremcts':
+        if config.transposition_table_size is not None:
+            transposition_table = TranspositionTable(
+                config.transposition_table_size)
+        if config.tree_path is None:
+            node_root = Node(
+                parent=None)
+        else:
+            # tree trained across sessions (see TreeStore)
+            if Path(config.tree_path).is_dir():
+                tree_store = TreeStore.load(config.tree_path)
+            else:
+                tree_store = TreeStore()
+            node_root = tree_store.get_root()
+    return node_root, tree_store, transposition_table
+
+
+def main(config: GameConfig):
+
+    players_victory_count = {k: 0 for k in range(config.nb_players)}
+    nb_games = config.nb_games
+
+    seeds = get_seeds(config)
+
+    node_root, tree_store, transposition_table = init_puremcts(config)
+
+    games_stats = []
+    for seed, players_scores, stats in tqdm(
+            play_games(config, node_root, seeds, transposition_table),
+            total=nb_games):
+        logging.info(f'Game seed {seed}: scores {players_scores}')
+        players_victory_count[argmax(players_scores)] += 1
+        games_stats.append((seed, stats))
+    close_decision_pool()
+    if tree_store is not None:
+        tree_store.save(config.tree_path)
+    if config.instrumentation:
+        write_stats_csv(config, games_stats)
+
+    # ratios = {k: v / nb_games for k, v in players_victory_count.items()}
+    # print(f"Victory ratios: {ratios}")
+
+    # SAVE CONFIG AND RESULTS TO CSV
+    write_games_csv(config, players_victory_count)
+
+
 if __name__ == "__main__":
     if GameConfig.log_level == 'DEBUG':
         level = logging.DEBUG
@@ -0,0 +1,324 @@
+'''
+Tree-parallel single observer information set Monte Carlo tree search
+(SO-ISMCTS).
+
+Each iteration draws a determinization of the hidden hands (none for a
+cheater), then goes down the tree of the searching player with UCT among
+the moves legal in this determinization, adds one node, plays the rest of
+the round randomly and backpropagates to each node the reward of the
+player who played its move: his score of the round normalized to [0, 1].
+Moves are bids (int) and cards (tuple): two copies of a card are the same
+move.
+The iterations are run by the GameConfig.nb_decision_workers workers of
+a process pool on one SharedTree, each worker with its own
+determinizations and playouts.
+A worker going down the tree adds a virtual loss to each node it selects
+(GameConfig.parallel_ismcts_virtual_loss visits without reward, removed
+by the backpropagation of the iteration), so that workers searching at
+the same time spread over different branches instead of all following
+the best one.
+The iterations of player_id2nb_of_iterations are shared between the
+workers, which all stop at the end of the time budget. The tree is not
+kept between decisions.
+With one decision worker (as in the workers of a game pool or of the
+decision server, which cannot start a pool), the iterations run in the
+process itself on a tree in its memory.
+As in flatmc, the last cards of a round can be chosen by the endgame
+solver (see GameConfig.endgame_max_cards_left and game_logic.endgame).
+'''
+import random
+import multiprocessing
+from math import log, sqrt
+from time import perf_counter
+
+from GameConfig import GameConfig
+from Game import Game
+from SharedTree import SharedTree
+from TreeStore import TreeStore
+from game_utils import (
+    play_card, get_score,
+    replace_hands_of_other_players_depending_of_player_pov)
+import instrumentation
+import game_logic
+
+# Created by get_tree_pool, with the tree its workers search
+tree_pool = None
+shared_tree = None
+# Tree of the searches run in the process (see get_local_tree)
+local_tree = None
+
+
+def get_tree_pool():
+    '''
+    Pool of GameConfig.nb_decision_workers processes sharing a SharedTree.
+    It is created at the first decision and kept for the following ones
+    (closed by game_logic.close_decision_pool).
+    '''
+    global tree_pool, shared_tree
+    if tree_pool is None:
+        tree = SharedTree(
+            GameConfig.parallel_ismcts_capacity,
+            GameConfig.parallel_ismcts_nb_lock_stripes)
+        try:
+            tree_pool = multiprocessing.Pool(
+                GameConfig.nb_decision_workers, init_tree_worker, (tree,))
+        finally:
+            # the shared memory would outlive the process
+            if tree_pool is None:
+                tree.close()
+        shared_tree = tree
+    return tree_pool
+
+
+def get_local_tree():
+    '''
+    Tree of the searches run in this process, created at the first one
+    and kept for the following ones.
+    '''
+    global local_tree
+    if local_tree is None:
+        local_tree = SharedTree(
+            GameConfig.parallel_ismcts_capacity, is_shared=False)
+    return local_tree
+
+
+def close_tree_pool():
+    global tree_pool, shared_tree, local_tree
+    if tree_pool is not None:
+        tree_pool.close()
+        tree_pool.join()
+        tree_pool = None
+        shared_tree.close()
+        shared_tree = None
+    local_tree = None
+
+
+def init_tree_worker(tree: SharedTree):
+    global shared_tree
+    shared_tree = tree
+
+
+def parallel_ismcts(game: Game, player_id: int, legal_moves=None, phase=None):
+    if phase == 'bid':
+        legal_moves = range(game.game_round + 1)
+    start_time = perf_counter()
+    if game_logic.is_endgame(game, phase):
+        move = game_logic.endgame(game, player_id, legal_moves, start_time)
+        if move is not None:
+            return move
+    deadline = game_logic.get_deadline(game, player_id, start_time)
+    nb_iterations = game.player_id2nb_of_iterations.get(player_id)
+    if nb_iterations is None and deadline is None:
+        raise ValueError(
+            f'config error: player {player_id} needs a number of iterations'
+            ' or a time budget.')
+    game.search_info = {
+        'player_id': player_id, 'phase': phase, 'moves': list(legal_moves)}
+
+    nb_workers = max(GameConfig.nb_decision_workers, 1)
+    if nb_workers == 1:
+        tree = get_local_tree()
+    else:
+        pool = get_tree_pool()
+        tree = shared_tree
+    tree.reset()
+    if phase == 'bid':
+        for bid in legal_moves:
+            tree.add_child(0, TreeStore.encode_move(bid), player_id)
+    if nb_workers == 1:
+        i_iteration = run_iterations(
+            game, tree, player_id, legal_moves, phase, nb_iterations,
+            deadline)
+    else:
+        if nb_iterations is not None:
+            nb_workers = min(nb_workers, max(nb_iterations, 1))
+        state = game.snapshot().to_bytes()
+        players_config = game.get_players_config()
+        tasks = [
+            (state, players_config, player_id, list(legal_moves), phase,
+             None if nb_iterations is None else
+             nb_iterations // nb_workers + (i < nb_iterations % nb_workers),
+             deadline, instrumentation.enabled, random.getrandbits(32))
+            for i in range(nb_workers)]
+        i_iteration = 0
+        for nb_worker_iterations, stats in pool.map(run_tree_worker, tasks):
+            i_iteration += nb_worker_iterations
+            if stats is not None:
+                instrumentation.merge(stats)
+
+    moves = get_moves(game, player_id, legal_moves, phase)
+    children = [tree.get_child(0, TreeStore.encode_move(x)) for x in moves]
+    won_games = tree.arrays['won_games']
+    n_visits = tree.arrays['n_visits']
+    if phase == 'bid':
+        # every bid is visited at each iteration: keep the best mean reward
+        best_index = max(
+            range(len(moves)),
+            key=lambda i: won_games[children[i]] / n_visits[children[i]]
+            if children[i] >= 0 and n_visits[children[i]] else -1)
+    else:
+        best_index = max(
+            range(len(moves)),
+            key=lambda i: n_visits[children[i]] if children[i] >= 0 else -1)
+    game.search_info['nb_nodes'] = int(tree.nb_nodes[0])
+    game_logic.set_search_time(
+        game, start_time, i_iteration,
+        [int(n_visits[x]) if x >= 0 else 0 for x in children])
+    if phase == 'bid':
+        return moves[best_index]
+    return [
+        i for i in legal_moves
+        if game.players_cards[player_id][i] == moves[best_index]][0]
+
+
+def run_tree_worker(args):
+    '''
+    Task of a worker: iterations on the shared tree until its number of
+    iterations (None: no limit) or the deadline (perf_counter clocks of
+    the processes of a machine are the same). Return the number of
+    iterations run and the instrumentation counters of the task (None if
+    the instrumentation is disabled).
+    '''
+    (state, players_config, player_id, legal_moves, phase, nb_iterations,
+     deadline, is_instrumented, seed) = args
+    game = game_logic.get_game_from_bytes(state, players_config)
+    random.seed(seed)
+    instrumentation.enabled = is_instrumented
+    instrumentation.reset()
+    i_iteration = run_iterations(
+        game, shared_tree, player_id, legal_moves, phase, nb_iterations,
+        deadline)
+    return i_iteration, \
+        instrumentation.get_stats() if is_instrumented else None
+
+
+def run_iterations(
+        game: Game, tree: SharedTree, player_id: int, legal_moves, phase,
+        nb_iterations, deadline):
+    '''
+    Iterations on 'tree' until 'nb_iterations' (None: no limit) or the
+    deadline, at least one. The game is restored to its state once they
+    are over. Return the number of iterations run.
+    '''
+    chckpt_state = game.snapshot()
+    i_iteration = 0
+    while (nb_iterations is None or i_iteration < nb_iterations) and (
+            deadline is None or perf_counter() < deadline
+            or i_iteration == 0):
+        game.restore(chckpt_state)
+        if not game.player_id2is_cheater[player_id]:
+            replace_hands_of_other_players_depending_of_player_pov(
+                game, player_id)
+        play_iteration(game, tree, player_id, legal_moves, phase)
+        i_iteration += 1
+    game.restore(chckpt_state)
+    return i_iteration
+
+
+def get_moves(game: Game, player_id: int, legal_moves, phase):
+    '''
+    Moves of the tree corresponding to legal moves (without duplicates).
+    '''
+    if phase == 'bid':
+        return list(legal_moves)
+    moves = []
+    for i in legal_moves:
+        card = game.players_cards[player_id][i]
+        if card not in moves:
+            moves.append(card)
+    return moves
+
+
+def play_iteration(
+        game: Game, tree: SharedTree, player_id: int, legal_moves, phase):
+    '''
+    One iteration on the shared tree (see the module docstring), with a
+    virtual loss on the nodes of the path until the backpropagation.
+    '''
+    virtual_loss = GameConfig.parallel_ismcts_virtual_loss
+    arrays = tree.arrays
+    won_games = arrays['won_games']
+    n_visits = arrays['n_visits']
+    n_available = arrays['n_available']
+    virtual_losses = arrays['virtual_loss']
+    # node indexes, -1 once out of the tree
+    path = [0]
+    tree.add_virtual_loss(0, virtual_loss)
+
+    def tree_policy(game: Game, p_id: int, legal_moves, phase):
+        index = path[-1]
+        if index < 0:
+            # out of the tree: random playout
+            if phase == 'bid':
+                return random.randint(0, game.game_round)
+            return random.choice(legal_moves)
+        moves = get_moves(game, p_id, legal_moves, phase)
+        children = [
+            tree.get_child(index, TreeStore.encode_move(move))
+            for move in moves]
+        # nodes in the search of another worker count as tried
+        untried = [
+            move for move, x in zip(moves, children)
+            if x < 0 or n_visits[x] + virtual_losses[x] == 0]
+        for child in children:
+            if child >= 0:
+                tree.incr_n_available(child)
+        if untried:
+            move = random.choice(untried)
+            child = tree.add_child(
+                index, TreeStore.encode_move(move), p_id)
+            if child >= 0:
+                tree.add_virtual_loss(child, virtual_loss)
+                path.append(child)
+            # leave the tree after the expansion
+            path.append(-1)
+        else:
+            move, child = max(zip(moves, children), key=lambda x: (
+                won_games[x[1]] / (n_visits[x[1]] + virtual_losses[x[1]])
+                + GameConfig.ismcts_exploration * sqrt(
+                    log(max(n_available[x[1]], 1))
+                    / (n_visits[x[1]] + virtual_losses[x[1]]))))
+            tree.add_virtual_loss(child, virtual_loss)
+            path.append(child)
+        if phase == 'bid':
+            return move
+        return [
+            i for i in legal_moves
+            if game.players_cards[p_id][i] == move][0]
+
+    previous_scores = list(game.players_scores)
+    game.mode_playout = True
+    game.playout_policy = tree_policy
+    # the move of 'player_id' is the first step in the tree
+    move = tree_policy(game, player_id, legal_moves, phase)
+    if phase == 'bid':
+        game.players_pred_folds[player_id] = move
+    else:
+        play_card(game, player_id=player_id, action=move)
+    game_logic.play_round(game)
+    game.playout_policy = None
+
+    # score of the round normalized to [0, 1]
+    rewards = [
+        (score - previous_score + 10 * game.game_round)
+        / (30 * game.game_round)
+        for score, previous_score in zip(game.players_scores,
+                                         previous_scores)]
+    for index in path:
+        if index < 0:
+            break
+        p_id = arrays['player_id'][index]
+        tree.update(
+            index, rewards[p_id] if p_id >= 0 else None, virtual_loss)
+    if phase == 'bid':
+        # Each bid of 'player_id' is scored with the folds he won in this
+        # playout, as in flatmc: the bid phase gets one sample per bid
+        # and per iteration.
+        won_folds = game.players_won_folds[player_id]
+        for child in tree.get_children(0):
+            if child != path[1]:
+                tree.update(
+                    child, (get_score(
+                        game, TreeStore.decode_move(arrays['move'][child]),
+                        won_folds) + 10 * game.game_round)
+                    / (30 * game.game_round), 0)
@@ -0,0 +1,55 @@
+'''
+Game states recorded at the decisions of random rounds, shared by
+benchmark.py and the tests.
+'''
+import random
+
+from GameConfig import GameConfig
+from Game import Game
+import game_logic
+
+
+def get_random_game(nb_players: int, **overrides):
+    '''
+    Game of GameConfig with 'nb_players' random players (not cheaters).
+    '''
+    config = {
+        k: v for k, v in vars(GameConfig).items() if not k.startswith('__')}
+    config.update({
+        'nb_players': nb_players,
+        'player_id2type_player': {i: 'random' for i in range(nb_players)},
+        'player_id2is_cheater': {i: False for i in range(nb_players)}})
+    config.update(overrides)
+    return Game(**config)
+
+
+def get_decision_states(
+        nb_players: int, nb_rounds: int, seed: int, is_recorded=None,
+        **overrides):
+    '''
+    Play 'nb_rounds' random rounds (rounds 1 to 10, then 1 again, ...) of a
+    game of get_random_game, seeded by 'seed'. Return the game and the
+    states of its decisions as [(GameState, player_id, legal_moves,
+    phase), ...], only the ones where is_recorded(game, phase) is true if
+    given.
+    '''
+    states = []
+
+    def record_state(game: Game, player_id: int, legal_moves, phase):
+        if is_recorded is None or is_recorded(game, phase):
+            states.append(
+                (game.snapshot(), player_id, list(legal_moves), phase))
+        if phase == 'bid':
+            return random.randint(0, game.game_round)
+        return random.choice(legal_moves)
+
+    random.seed(seed)
+    game = get_random_game(nb_players, **overrides)
+    for i_round in range(nb_rounds):
+        game.game_round = i_round % 10 + 1
+        game_logic.init_round(game)
+        game.mode_playout = True
+        game.playout_policy = record_state
+        game_logic.play_round(game)
+    game.playout_policy = None
+    return game, states
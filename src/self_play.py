@@ -0,0 +1,215 @@
+'''
+Self-play dataset: the decisions of simulated games (players of
+GameConfig) written as rows of a ShardedDataset, one row per bid or card
+played by any player (not in playouts):
+    - seed: seed of the game (see main.play_seeded_game),
+    - player_id,
+    - features: int16 vector of the game seen by the player before his
+      decision (see get_feature_layout),
+    - action: bid, or Deck.card2index index of the card played,
+    - round_score: score of the player in the round of the decision,
+    - game_score: score of the player at the end of the game,
+    - is_winner: 1 if the player won the game (all the players tied at
+      the best score won).
+Games are played (over config.nb_game_workers processes) and written one
+after the other by generators, so that only one game is kept in memory
+per worker.
+usage:
+    python self_play.py OUTPUT_DIR [--nb-games 100] [--shard-size 100000]
+'''
+import random
+import logging
+import argparse
+import multiprocessing
+
+import numpy as np
+from tqdm import tqdm
+
+from Deck import Deck
+from Game import Game
+from GameConfig import GameConfig
+from GameState import get_color_code
+from ShardedDataset import ShardedDataset
+import main
+
+NO_VALUE = -1
+PHASES = ('bid', 'play_card')
+
+
+def get_feature_layout(nb_players: int):
+    '''
+    {name: (start, size)} of the features. Per-player features (bids,
+    won_folds, scores) start with the player of the row and follow the
+    order of play: item i is the one of player (player_id + i) %
+    nb_players. Cards are Deck.card2index indexes.
+        - game_round, phase (0: bid, 1: play_card), position (of the player
+          in the fold, or in the bids), fold_index (folds played)
+        - hand: count of each card in the cards the player has not played
+        - observed: cards the player observed (see
+          players_observed_cards_in_round)
+        - bids: -1 for players who have not bid yet
+        - won_folds: in the round
+        - scores: of the game before the round
+        - fold: cards of the fold in progress in the order they were played
+          (-1: not played yet)
+        - chosen_color: code of GameState (0: None)
+    '''
+    sizes = {
+        'game_round': 1, 'phase': 1, 'position': 1, 'fold_index': 1,
+        'hand': Deck.number_of_cards, 'observed': Deck.number_of_cards,
+        'bids': nb_players, 'won_folds': nb_players, 'scores': nb_players,
+        'fold': nb_players, 'chosen_color': 1}
+    layout = {}
+    start = 0
+    for name, size in sizes.items():
+        layout[name] = (start, size)
+        start += size
+    return layout
+
+
+def get_row_dtype(nb_players: int):
+    layout = get_feature_layout(nb_players)
+    nb_features = sum(size for _, size in layout.values())
+    return np.dtype([
+        ('seed', np.int64), ('player_id', np.int8),
+        ('features', np.int16, (nb_features,)), ('action', np.int16),
+        ('round_score', np.int16), ('game_score', np.int32),
+        ('is_winner', np.int8)])
+
+
+def get_features(game: Game, player_id: int, phase: str):
+    '''
+    Features (see get_feature_layout) of 'player_id' at his decision.
+    '''
+    nb_players = game.nb_players
+    seats = [(player_id + i) % nb_players for i in range(nb_players)]
+    hand = [0] * Deck.number_of_cards
+    for card, is_played in zip(
+            game.players_cards[player_id],
+            game.players_played_cards_indexes[player_id]):
+        if not is_played:
+            hand[Deck.card2index[card]] += 1
+    if phase == 'bid':
+        # players bid in the order of their ids (see play_round)
+        position = player_id
+        bids = [
+            game.players_pred_folds[p_id] if p_id < player_id
+            else NO_VALUE for p_id in seats]
+    else:
+        position = len(game.fold_cards)
+        bids = [game.players_pred_folds[p_id] for p_id in seats]
+    fold = [Deck.card2index[card] for card in game.fold_cards]
+    return [
+        game.game_round, PHASES.index(phase), position, game.chckpt_fold,
+        *hand,
+        *[1 if x else 0
+          for x in game.players_observed_cards_in_round[player_id]],
+        *bids,
+        *[game.players_won_folds[p_id] for p_id in seats],
+        *[game.players_scores[p_id] for p_id in seats],
+        *fold, *[NO_VALUE] * (nb_players - len(fold)),
+        get_color_code(game.chosen_color)]
+
+
+def play_recorded_game(config: GameConfig, seed: int):
+    '''
+    Play the game of 'seed' and return the rows of its decisions.
+    '''
+    decisions = []
+    # scores of the game at the beginning of each round
+    round2scores = {}
+
+    def record_decision(game: Game, player_id: int, phase: str, move):
+        if phase == 'play_card':
+            move = Deck.card2index[game.players_cards[player_id][move]]
+        round2scores.setdefault(game.game_round, list(game.players_scores))
+        decisions.append((
+            player_id, game.game_round,
+            get_features(game, player_id, phase), move))
+
+    game = main.play_seeded_game(
+        config, None, seed, decision_recorder=record_decision)
+    final_scores = game.players_scores
+    best_score = max(final_scores)
+    rows = np.zeros(len(decisions), dtype=get_row_dtype(game.nb_players))
+    if not decisions:
+        return rows
+    players_ids, game_rounds, features, moves = zip(*decisions)
+    rows['seed'] = seed
+    rows['player_id'] = players_ids
+    rows['features'] = features
+    rows['action'] = moves
+    rows['round_score'] = [
+        round2scores.get(game_round + 1, final_scores)[player_id]
+        - round2scores[game_round][player_id]
+        for player_id, game_round in zip(players_ids, game_rounds)]
+    rows['game_score'] = [final_scores[x] for x in players_ids]
+    rows['is_winner'] = [
+        final_scores[x] == best_score for x in players_ids]
+    return rows
+
+
+def play_recorded_game_task(seed: int):
+    '''
+    Task run by a worker of the game pool (see main.init_game_worker).
+    '''
+    return play_recorded_game(GameConfig, seed)
+
+
+def generate_games_rows(config: GameConfig, seeds: list):
+    '''
+    Yield the rows of the game of each seed, in the order of 'seeds'.
+    '''
+    if config.mcts_type == 'puremcts' or 'puremcts' in \
+            config.player_id2mcts_type.values():
+        raise ValueError(
+            'config error: self-play does not keep a puremcts tree.')
+    if config.nb_game_workers <= 1:
+        for seed in seeds:
+            yield play_recorded_game(config, seed)
+        return
+    with multiprocessing.Pool(
+            config.nb_game_workers, initializer=main.init_game_worker,
+            initargs=(main.get_config_dict(config),)) as pool:
+        yield from pool.imap(play_recorded_game_task, seeds)
+
+
+def write_self_play_dataset(
+        config: GameConfig, directory: str, shard_size=100000):
+    '''
+    Play config.nb_games games (seeds of main.get_seeds) and write their
+    decisions in a ShardedDataset in 'directory'. Return the number of
+    rows written.
+    '''
+    seeds = main.get_seeds(config)
+    dataset = ShardedDataset(
+        directory, get_row_dtype(config.nb_players), shard_size,
+        metadata={
+            'features': get_feature_layout(config.nb_players),
+            'config': main.get_config_dict(config)})
+    nb_rows = 0
+    try:
+        for rows in tqdm(generate_games_rows(config, seeds), total=len(seeds)):
+            dataset.write(rows)
+            nb_rows += len(rows)
+    finally:
+        dataset.close()
+    return nb_rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Write the decisions of self-play games as a dataset.')
+    parser.add_argument('output')
+    parser.add_argument('--nb-games', type=int, default=None)
+    parser.add_argument('--shard-size', type=int, default=100000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    if args.nb_games is not None:
+        GameConfig.nb_games = args.nb_games
+    if GameConfig.seed is None:
+        GameConfig.seed = random.getrandbits(32)
+    nb_rows = write_self_play_dataset(
+        GameConfig, args.output, args.shard_size)
+    print(f'{nb_rows} decisions written in {args.output}')
@@ -0,0 +1,158 @@
+'''
+Play the games of a grid of configs and stream their results into an
+ExperimentStore (SQLite).
+The grid is a JSON file: 'base' overrides GameConfig for every config and
+'grid' gives the values to try for some attributes; one config is played
+for each combination of these values, for example:
+    {"base": {"nb_games": 100, "seed": 0, "log_level": "WARNING"},
+     "grid": {"player_id2nb_of_iterations": [{"1": 15}, {"1": 50}],
+              "player_id2is_cheater": [{"1": true}, {"1": false}]}}
+Results are written every 'batch_size' games. Running a sweep again on
+the same store resumes it: the games of a config are the ones of its
+seeds (see main.get_seeds) and only the ones missing from the store are
+played. (A puremcts tree is rebuilt from scratch when a config resumes,
+unless tree_path is set.) A config is identified by the attributes that
+change its games (GameConfig.OUTCOME_ATTRIBUTES): a sweep resumes with
+more games or another number of workers, and only these attributes can
+be in 'grid'.
+'export' writes the victories of each config of the store with the
+schema of the CSV of main.main.
+usage:
+    python sweep.py run GRID_JSON STORE [--batch-size 20]
+    python sweep.py export STORE CSV
+'''
+import json
+import logging
+import argparse
+import itertools
+
+from tqdm import tqdm
+from numpy import argmax
+
+from GameConfig import GameConfig, OUTCOME_ATTRIBUTES
+from ExperimentStore import ExperimentStore
+from game_logic import close_decision_pool
+import main
+
+
+def get_grid_configs(grid_json: dict):
+    '''
+    Config dicts (GameConfig attributes with the overrides of the grid)
+    of each combination of the grid.
+    '''
+    base = main.get_config_dict(GameConfig)
+    base.update(grid_json.get('base', {}))
+    grid = grid_json.get('grid', {})
+    for k in grid:
+        if k not in OUTCOME_ATTRIBUTES:
+            raise ValueError(
+                f'config error: {k} does not change the games of a config '
+                '(see GameConfig.OUTCOME_ATTRIBUTES) and cannot be swept.')
+    configs = []
+    for values in itertools.product(*grid.values()):
+        config_dict = dict(base)
+        config_dict.update(zip(grid.keys(), values))
+        # same key types as GameConfig (JSON object keys are strings)
+        configs.append(ExperimentStore.loads_config(
+            ExperimentStore.dumps_config(config_dict)))
+    return configs
+
+
+def set_config(config_dict: dict):
+    '''
+    Set the attributes of GameConfig (game_logic reads some of them
+    directly) to the values of 'config_dict' and return it.
+    '''
+    for k, v in config_dict.items():
+        setattr(GameConfig, k, v)
+    return GameConfig
+
+
+def run_config(store: ExperimentStore, config, batch_size: int):
+    '''
+    Play the games of 'config' missing from 'store', writing them by
+    batches of 'batch_size' games.
+    '''
+    seeds = main.get_seeds(config)
+    finished_games = store.get_finished_games(config.id_config)
+    # a seed can be drawn twice: i_game keeps games apart
+    seed2i_games = {}
+    for i_game, seed in enumerate(seeds):
+        if i_game not in finished_games:
+            seed2i_games.setdefault(seed, []).append(i_game)
+    remaining_seeds = [
+        seed for i_game, seed in enumerate(seeds)
+        if i_game not in finished_games]
+    if not remaining_seeds:
+        return
+    node_root, tree_store, transposition_table = main.init_puremcts(config)
+    games = []
+    for seed, players_scores, _ in tqdm(
+            main.play_games(
+                config, node_root, remaining_seeds, transposition_table),
+            total=len(remaining_seeds), desc=f'config {config.id_config}'):
+        games.append((
+            seed2i_games[seed].pop(0), seed, players_scores,
+            int(argmax(players_scores))))
+        if len(games) == batch_size:
+            store.add_games(config.id_config, games)
+            games = []
+    store.add_games(config.id_config, games)
+    if tree_store is not None:
+        tree_store.save(config.tree_path)
+
+
+def run_sweep(grid_json: dict, store_path: str, batch_size=20):
+    configs = get_grid_configs(grid_json)
+    if any(x['seed'] is None for x in configs):
+        raise ValueError(
+            'config error: a sweep needs a seed to be resumed with the '
+            'same games.')
+    store = ExperimentStore(store_path)
+    try:
+        for config_dict in configs:
+            config_dict['id_config'] = store.get_id_config(config_dict)
+            run_config(store, set_config(config_dict), batch_size)
+            # the next config may use another number of decision workers
+            close_decision_pool()
+    finally:
+        close_decision_pool()
+        store.close()
+
+
+def export_csv(store_path: str, csv_name: str):
+    '''
+    Victories of each player of each config of the store, with the schema
+    of the CSV written by main.main.
+    '''
+    store = ExperimentStore(store_path)
+    try:
+        for id_config, config_dict in store.get_configs():
+            config_dict['id_config'] = id_config
+            config_dict['csv_name'] = csv_name
+            config = set_config(config_dict)
+            main.write_games_csv(config, store.get_victory_counts(
+                id_config, config.nb_players))
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Run a grid of configs or export its results.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run')
+    run_parser.add_argument('grid')
+    run_parser.add_argument('store')
+    run_parser.add_argument('--batch-size', type=int, default=20)
+    export_parser = subparsers.add_parser('export')
+    export_parser.add_argument('store')
+    export_parser.add_argument('csv')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        logging.basicConfig(level=logging.WARNING)
+        with open(args.grid) as f:
+            run_sweep(json.load(f), args.store, args.batch_size)
+    else:
+        export_csv(args.store, args.csv)
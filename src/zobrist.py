@@ -0,0 +1,96 @@
+'''
+Zobrist-style hash of the information state of a player in a round:
+round, bids, cards he observed (his hand and the cards played), current
+fold, folds won by each player and player to move.
+The keys are combined by addition modulo 2**64 instead of xor, so that
+multisets (two copies of a card, several folds won by a player) do not
+cancel out. The hash is updated incrementally while the round is played
+(see init_round, play_round and play_card):
+    - game.public_info_hash: part known by every player,
+    - game.players_hand_hashes: hand dealt to each player.
+The keys are drawn from a fixed seed, so hashes are the same in every
+process and every run (a transposition table can be shared by games).
+'''
+import random
+
+from Deck import Deck
+
+HASH_MASK = 2 ** 64 - 1
+MAX_PLAYERS = 8
+
+_rng = random.Random(0)
+
+
+def _get_keys(*shape):
+    if len(shape) == 1:
+        return [_rng.getrandbits(64) for _ in range(shape[0])]
+    return [_get_keys(*shape[1:]) for _ in range(shape[0])]
+
+
+ROUND_KEYS = _get_keys(Deck.number_of_cards + 1)
+# [player_id][bid]
+BID_KEYS = _get_keys(MAX_PLAYERS, Deck.number_of_cards + 1)
+# [card_index], keys of the cards of a hand and of the played cards
+HAND_KEYS = _get_keys(Deck.number_of_cards)
+PLAYED_KEYS = _get_keys(Deck.number_of_cards)
+# [position in the fold][card_index]
+FOLD_KEYS = _get_keys(MAX_PLAYERS, Deck.number_of_cards)
+WON_FOLD_KEYS = _get_keys(MAX_PLAYERS)
+TURN_KEYS = _get_keys(MAX_PLAYERS)
+
+
+def init_round_hashes(game):
+    '''
+    Hashes at the beginning of a round, once the cards are dealt.
+    '''
+    game.public_info_hash = ROUND_KEYS[game.game_round]
+    game.players_hand_hashes = [
+        sum(HAND_KEYS[Deck.card2index[card]] for card in hand) & HASH_MASK
+        for hand in game.players_cards]
+
+
+def hash_bid(game, player_id: int, bid: int):
+    game.public_info_hash = (
+        game.public_info_hash + BID_KEYS[player_id][bid]) & HASH_MASK
+
+
+def hash_card(game, card_index: int):
+    '''
+    Card added to the fold (before it is appended to game.fold_cards).
+    '''
+    game.public_info_hash = (
+        game.public_info_hash + PLAYED_KEYS[card_index]
+        + FOLD_KEYS[len(game.fold_cards)][card_index]) & HASH_MASK
+
+
+def hash_fold_won(game, player_who_won: int):
+    '''
+    Fold won by 'player_who_won' (before game.fold_cards is emptied).
+    '''
+    fold_hash = sum(
+        FOLD_KEYS[i][Deck.card2index[card]]
+        for i, card in enumerate(game.fold_cards))
+    game.public_info_hash = (
+        game.public_info_hash - fold_hash + WON_FOLD_KEYS[player_who_won]
+        ) & HASH_MASK
+
+
+def get_info_hash(game, player_id: int):
+    '''
+    Hash of the information state of 'player_id' when he has to play.
+    '''
+    return (game.public_info_hash + game.players_hand_hashes[player_id]
+            + TURN_KEYS[player_id]) & HASH_MASK
+
+
+def get_move_hash(game, player_id: int, move, phase: str):
+    '''
+    Change of the hashes when 'player_id' plays 'move' (a bid or a card):
+    get_info_hash + get_move_hash identifies the information state
+    reached by the move.
+    '''
+    if phase == 'bid':
+        return BID_KEYS[player_id][move]
+    card_index = Deck.card2index[move]
+    return PLAYED_KEYS[card_index] + FOLD_KEYS[len(game.fold_cards)][
+        card_index]
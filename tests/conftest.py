@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The modules of src are imported flat, as when running from src
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
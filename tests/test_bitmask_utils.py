@@ -0,0 +1,53 @@
+import random
+from collections import Counter
+
+import pytest
+
+import bitmask_utils
+import game_utils
+from recorded_states import get_decision_states
+
+
+@pytest.mark.parametrize('nb_players', [2, 3, 5])
+def test_legal_moves(nb_players):
+    game, states = get_decision_states(
+        nb_players, 20, nb_players,
+        lambda game, phase: phase == 'play_card')
+    assert states
+    for state, player_id, legal_moves, _ in states:
+        game.restore(state)
+        assert bitmask_utils.get_legal_moves(game, player_id) == legal_moves
+        for p_id in range(nb_players):
+            assert bitmask_utils.get_legal_moves(game, p_id) == \
+                game_utils.get_legal_moves(game, p_id)
+
+
+@pytest.mark.parametrize('nb_players', [2, 4])
+def test_masks_follow_the_cards(nb_players):
+    '''
+    The masks kept by play_card and set_determinization are the ones
+    computed from the cards.
+    '''
+    game, states = get_decision_states(nb_players, 20, nb_players)
+    random.seed(0)
+    for state, player_id, _, phase in states:
+        game.restore(state)
+        game_utils.set_determinization(
+            game, game_utils.get_determinizations(game, player_id)[0])
+        if phase == 'play_card':
+            game_utils.play_card(
+                game, player_id,
+                random.choice(game_utils.get_legal_moves(game, player_id)))
+        masks = game.snapshot()
+        masks.set_masks()
+        for p_id in range(nb_players):
+            hand_mask, played_mask, _ = \
+                bitmask_utils.get_player_masks(game, p_id)
+            assert hand_mask == masks.players_hand_masks[p_id]
+            assert played_mask == masks.players_played_masks[p_id]
+            assert Counter(bitmask_utils.get_cards_from_mask(
+                hand_mask & ~played_mask)) == Counter(
+                    card for card, is_played in zip(
+                        game.players_cards[p_id],
+                        game.players_played_cards_indexes[p_id])
+                    if not is_played)
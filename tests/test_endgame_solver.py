@@ -0,0 +1,100 @@
+from time import perf_counter
+
+import pytest
+
+from GameConfig import GameConfig
+from Game import Game
+from Deck import Deck
+import game_logic
+from game_utils import (
+    play_card, get_legal_moves, get_score, get_index_winner_card)
+from endgame_solver import get_moves_outcomes, get_nb_cards_left
+from recorded_states import get_decision_states
+
+
+def get_end_states(nb_players: int, nb_rounds: int, max_cards_left: int):
+    '''
+    [(GameState, player_id, legal_moves), ...] at the card decisions of
+    random rounds with at most 'max_cards_left' cards left.
+    '''
+    game, states = get_decision_states(
+        nb_players, nb_rounds, nb_players,
+        lambda game, phase: phase == 'play_card'
+        and get_nb_cards_left(game) <= max_cards_left)
+    return game, [
+        (state, player_id, legal_moves)
+        for state, player_id, legal_moves, _ in states]
+
+
+def solve_by_brute_force(game: Game):
+    '''
+    Folds won at the end of the round when every player plays the card
+    maximizing his own score, found by playing every card with the engine
+    (ties go to the card of lowest index, as in the solver).
+    '''
+    nb_players = game.nb_players
+    if len(game.fold_cards) == nb_players:
+        winner = (
+            game.first_player + get_index_winner_card(game.fold_cards)
+            ) % nb_players
+        game.players_won_folds[winner] += 1
+        game.first_player = winner
+        game.fold_cards = []
+        game.chosen_color = None
+        if get_nb_cards_left(game) == 0:
+            return tuple(game.players_won_folds)
+    player_id = (game.first_player + len(game.fold_cards)) % nb_players
+    card2move = {}
+    for i in get_legal_moves(game, player_id):
+        card2move.setdefault(
+            Deck.card2index[game.players_cards[player_id][i]], i)
+    state = game.snapshot()
+    best_score = None
+    for card in sorted(card2move):
+        game.restore(state)
+        play_card(game, player_id, card2move[card])
+        outcome = solve_by_brute_force(game)
+        score = get_score(
+            game, game.players_pred_folds[player_id], outcome[player_id])
+        if best_score is None or score > best_score:
+            best_score = score
+            best_outcome = outcome
+    game.restore(state)
+    return best_outcome
+
+
+@pytest.mark.parametrize('nb_players', [2, 3, 4])
+def test_solver_against_brute_force(nb_players):
+    game, states = get_end_states(nb_players, 20, 6)
+    assert states
+    for state, player_id, legal_moves in states:
+        game.restore(state)
+        outcomes = get_moves_outcomes(game, player_id, legal_moves)
+        for move, outcome in zip(legal_moves, outcomes):
+            game.restore(state)
+            play_card(game, player_id, move)
+            assert solve_by_brute_force(game) == outcome
+
+
+def test_solver_deadline():
+    game, states = get_end_states(3, 10, 8)
+    state, player_id, legal_moves = states[0]
+    game.restore(state)
+    assert get_moves_outcomes(
+        game, player_id, legal_moves, perf_counter() - 1) is None
+    game.restore(state)
+    assert get_moves_outcomes(
+        game, player_id, legal_moves, perf_counter() + 60) is not None
+
+
+def test_flatmc_falls_back_to_playouts(monkeypatch):
+    monkeypatch.setattr(GameConfig, 'endgame_max_cards_left', 8)
+    game, states = get_end_states(3, 10, 8)
+    state, player_id, legal_moves = states[0]
+    game.player_id2time_budget_ms = {player_id: 0}
+    game.player_id2nb_of_iterations = {player_id: None}
+    game.restore(state)
+    game.mode_playout = False
+    move = game_logic.flatmc(game, player_id, legal_moves, 'play_card')
+    assert move in legal_moves
+    assert 'endgame' not in game.search_info
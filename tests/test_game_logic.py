@@ -0,0 +1,52 @@
+from GameConfig import GameConfig
+import game_logic
+from recorded_states import get_decision_states
+
+
+def get_search_states(min_nb_moves: int):
+    '''
+    Game and card decisions of random rounds of 2 players with at least
+    'min_nb_moves' legal moves, the players being flatmc players.
+    '''
+    game, states = get_decision_states(
+        2, 10, 0, lambda game, phase: phase == 'play_card')
+    game.mode_playout = False
+    game.player_id2type_player = {0: 'mcts', 1: 'mcts'}
+    return game, [
+        (state, player_id, legal_moves)
+        for state, player_id, legal_moves, _ in states
+        if len(legal_moves) >= min_nb_moves]
+
+
+def test_flatmc_fewer_iterations_than_moves(monkeypatch):
+    monkeypatch.setattr(GameConfig, 'endgame_max_cards_left', None)
+    game, states = get_search_states(6)
+    assert states
+    game.player_id2nb_of_iterations = {0: 5, 1: 5}
+    game.player_id2time_budget_ms = {0: 50, 1: 50}
+    for state, player_id, legal_moves in states:
+        game.restore(state)
+        move = game_logic.flatmc(game, player_id, legal_moves, 'play_card')
+        assert move in legal_moves
+        assert min(game.search_info['move_visits']) >= 1
+
+
+def test_successive_halving_spends_the_budget(monkeypatch):
+    monkeypatch.setattr(GameConfig, 'endgame_max_cards_left', None)
+    game, states = get_search_states(10)
+    assert states
+    game.player_id2time_budget_ms = {0: None, 1: None}
+    game.player_id2allocation = {
+        0: 'successive_halving', 1: 'successive_halving'}
+    for nb_iterations in [5, 15, 100]:
+        game.player_id2nb_of_iterations = {0: nb_iterations, 1: nb_iterations}
+        for state, player_id, legal_moves in states:
+            game.restore(state)
+            move = game_logic.flatmc(
+                game, player_id, legal_moves, 'play_card')
+            moves_visits = game.search_info['move_visits']
+            assert min(moves_visits) >= 1
+            # the playouts left are fewer than the survivors of a round
+            assert nb_iterations - len(legal_moves) < sum(moves_visits) \
+                <= max(nb_iterations, len(legal_moves))
+            assert moves_visits[legal_moves.index(move)] == max(moves_visits)
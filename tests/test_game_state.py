@@ -0,0 +1,27 @@
+import pytest
+
+from GameState import GameState
+from recorded_states import get_decision_states
+
+
+@pytest.mark.parametrize('nb_players', [2, 3, 4, 6])
+def test_bytes_round_trip(nb_players):
+    game, states = get_decision_states(nb_players, 10, nb_players)
+    assert any(len(state.fold_cards) > 0 for state, _, _, _ in states)
+    for state, _, _, _ in states:
+        data = state.to_bytes()
+        decoded = GameState.from_bytes(memoryview(data))
+        for name in GameState.__slots__:
+            assert getattr(decoded, name) == getattr(state, name), name
+        assert decoded.to_bytes() == data
+        # the decoded state plays on as the original one
+        game.restore(decoded)
+        assert game.snapshot().to_bytes() == data
+
+
+def test_bytes_version():
+    game, states = get_decision_states(2, 1, 0)
+    data = bytearray(states[0][0].to_bytes())
+    data[4] += 1
+    with pytest.raises(ValueError):
+        GameState.from_bytes(data)
@@ -0,0 +1,84 @@
+from itertools import permutations, product
+
+import pytest
+
+from Deck import Deck
+from game_utils import get_index_winner_card, get_index_winner_card_index
+
+# Folds have one card per player, 2 to 6 players
+FOLD_SIZES = range(2, 7)
+# Cards standing for the whole deck in the folds of 4 cards or more: the
+# resolvers only compare kinds, colors (red, blue and yellow play the same
+# role) and the values of cards of the same color
+REPRESENTATIVE_CARDS = [
+    ('escape', None), ('pirate', None), ('mermaid', None),
+    ('skull_king', None), (1, 'red'), (7, 'red'), (13, 'red'), (5, 'blue'),
+    (2, 'black'), (11, 'black')]
+
+
+def get_deck_folds(fold_size: int):
+    '''
+    Every fold of 'fold_size' cards of the deck, as card indexes.
+    '''
+    return permutations(range(Deck.number_of_cards), fold_size)
+
+
+def get_representative_folds(fold_size: int):
+    '''
+    Every fold of 'fold_size' REPRESENTATIVE_CARDS that can be dealt (no
+    more copies of a card than in the deck), as card indexes.
+    '''
+    for cards in product(REPRESENTATIVE_CARDS, repeat=fold_size):
+        copies = {}
+        fold = []
+        for card in cards:
+            indexes = Deck.card2indexes[card]
+            i_copy = copies.get(card, 0)
+            if i_copy == len(indexes):
+                break
+            copies[card] = i_copy + 1
+            fold.append(indexes[i_copy])
+        else:
+            yield tuple(fold)
+
+
+def assert_same_winners(folds):
+    nb_folds = 0
+    for fold in folds:
+        expected = get_index_winner_card(
+            [Deck.cards_list[i] for i in fold])
+        assert get_index_winner_card_index(fold) == expected, fold
+        nb_folds += 1
+    assert nb_folds > 0
+
+
+@pytest.mark.parametrize('fold_size', [2, 3])
+def test_deck_folds(fold_size):
+    assert_same_winners(get_deck_folds(fold_size))
+
+
+@pytest.mark.parametrize('fold_size', FOLD_SIZES)
+def test_representative_folds(fold_size):
+    assert_same_winners(get_representative_folds(fold_size))
+
+
+@pytest.mark.parametrize('cards, winner', [
+    ([('escape', None)] * 2, 0),
+    ([('escape', None)] * 6, 0),
+    ([('escape', None), (3, 'red'), (9, 'red')], 2),
+    ([('skull_king', None), ('mermaid', None)], 1),
+    ([('pirate', None), ('mermaid', None)], 0),
+    ([('pirate', None), ('skull_king', None)], 1),
+    ([('skull_king', None), ('pirate', None), ('pirate', None)], 0),
+    ([(13, 'black'), ('pirate', None), ('mermaid', None)], 1),
+    ([(2, 'red'), (13, 'blue'), (1, 'black')], 2),
+])
+def test_known_folds(cards, winner):
+    fold = []
+    copies = {}
+    for card in cards:
+        fold.append(Deck.card2indexes[card][copies.get(card, 0)])
+        copies[card] = copies.get(card, 0) + 1
+    fold = tuple(fold)
+    assert get_index_winner_card(cards) == winner
+    assert get_index_winner_card_index(fold) == winner
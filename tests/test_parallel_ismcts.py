@@ -0,0 +1,46 @@
+from GameConfig import GameConfig
+import parallel_ismcts
+from endgame_solver import get_nb_cards_left
+from recorded_states import get_decision_states
+
+
+def get_search_states():
+    game, states = get_decision_states(3, 10, 0)
+    game.mode_playout = False
+    game.player_id2type_player = {i: 'mcts' for i in range(3)}
+    game.player_id2nb_of_iterations = {i: 20 for i in range(3)}
+    game.player_id2time_budget_ms = {i: None for i in range(3)}
+    return game, states
+
+
+def test_one_worker_searches_in_process(monkeypatch):
+    monkeypatch.setattr(GameConfig, 'nb_decision_workers', 1)
+    monkeypatch.setattr(GameConfig, 'endgame_max_cards_left', None)
+    game, states = get_search_states()
+    try:
+        for state, player_id, legal_moves, phase in states[::5]:
+            game.restore(state)
+            move = parallel_ismcts.parallel_ismcts(
+                game, player_id, legal_moves, phase)
+            assert move in legal_moves
+            assert game.search_info['nb_iterations'] == 20
+            assert game.snapshot().to_bytes() == state.to_bytes()
+        assert parallel_ismcts.tree_pool is None
+    finally:
+        parallel_ismcts.close_tree_pool()
+
+
+def test_endgame(monkeypatch):
+    monkeypatch.setattr(GameConfig, 'nb_decision_workers', 1)
+    monkeypatch.setattr(GameConfig, 'endgame_max_cards_left', 4)
+    game, states = get_search_states()
+    try:
+        for state, player_id, legal_moves, phase in states:
+            game.restore(state)
+            move = parallel_ismcts.parallel_ismcts(
+                game, player_id, legal_moves, phase)
+            assert move in legal_moves
+            assert game.search_info.get('endgame', False) == (
+                phase == 'play_card' and get_nb_cards_left(game) <= 4)
+    finally:
+        parallel_ismcts.close_tree_pool()
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from Deck import Deck
+from ValueTable import ValueTable
+from build_value_table import build_value_table
+from recorded_states import get_decision_states
+
+
+@pytest.fixture(scope='module')
+def table():
+    return build_value_table(2, 2000, batch_size=500, seed=0)
+
+
+def test_build_is_seeded(table):
+    assert np.array_equal(
+        build_value_table(2, 2000, batch_size=500, seed=0).counts,
+        table.counts)
+
+
+def test_save_and_load(table, tmp_path):
+    path = str(tmp_path / 'table.npy')
+    table.save(path)
+    assert np.array_equal(ValueTable.load(path).counts, table.counts)
+
+
+def test_best_bids_agree(table):
+    game, states = get_decision_states(
+        2, 10, 0, lambda game, phase: phase == 'bid')
+    for state, player_id, _, _ in states:
+        game.restore(state)
+        hands = np.array([[
+            [Deck.card2index[card] for card in game.players_cards[p_id]]
+            for p_id in range(2)]])
+        batch_best_bids = table.get_batch_best_bids(game, hands, [0, 1])
+        assert batch_best_bids.shape == (1, 2)
+        for p_id in range(2):
+            assert table.get_best_bid(game, p_id) == \
+                batch_best_bids[0, p_id]
+            assert 0 <= batch_best_bids[0, p_id] <= game.game_round
+        probabilities = table.get_won_folds_probabilities(game, player_id)
+        assert len(probabilities) == game.game_round + 1
+        assert probabilities.sum() == pytest.approx(1)
+
+
+def test_other_nb_players(table):
+    game, states = get_decision_states(3, 1, 0)
+    game.restore(states[0][0])
+    with pytest.raises(ValueError, match='config error'):
+        table.get_best_bid(game, 0)